@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Benchmark render_events.py on synthetic datasets of increasing size.
+
+Datasets are generated from the shape of wars_of_the_roses.json: event type
+mix, commanders per battle, allegiance and victor frequencies, and the
+optional fields of each type are sampled from the real events. The real
+commander names are extended with synthetic ones and drawn with Zipf-like
+weights, so a few names recur across many battles as they do in the real
+data. Generation is seeded and every dataset is schema-valid.
+
+For each size it times generate_event_html over every event, generate_html
+and the full command line, run in a fresh process: without the fragment
+cache, with --cache starting empty (cold) and with --cache after a priming
+run (warm). It reports wall time (best of --repeat), events per second,
+peak memory (tracemalloc for the in-process benchmarks, child max RSS for
+the command line) and output bytes.
+
+Usage:
+    python bench_render.py [--sizes N ...] [--repeat R] [--seed S]
+        [--save FILE] [--compare FILE] [--threshold FRACTION]
+    python bench_render.py --generate N > events.json
+
+Options:
+    --sizes N ...      Event counts to benchmark (default: 100 1000 10000 100000;
+                       add 1000000 for the largest runs).
+    --save FILE        Write the results as JSON, e.g. as a baseline.
+    --compare FILE     Compare against a saved baseline and exit with status 1
+                       if any wall time is more than --threshold slower
+                       (default 0.10, i.e. 10%).
+    --generate N       Print a synthetic dataset of N events and exit.
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import render_events
+
+CODE_DIR = Path(__file__).resolve().parent
+SAMPLE_PATH = CODE_DIR.parent / 'wars_of_the_roses.json'
+RENDERER = CODE_DIR / 'render_events.py'
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+TITLES = ['Lord', 'Sir', 'Earl of', 'Duke of', 'Baron']
+PLACES = ['Alnwick', 'Bamburgh', 'Carlisle', 'Dunstanburgh', 'Exeter', 'Fauconberg', 'Grantham',
+          'Harlech', 'Ipswich', 'Kendal', 'Lincoln', 'Middleham', 'Norwich', 'Oxford', 'Pontefract',
+          'Raby', 'Stafford', 'Towcester', 'Usk', 'Warkworth', 'York', 'Zouche']
+
+class DatasetGenerator:
+    """Seeded generator of events shaped like a sample timeline."""
+
+    def __init__(self, sample: dict, seed: int = 0, extra_names: int = 60):
+        self.sample = sample
+        self.random = random.Random(seed)
+        events = sample['events']
+        self.types = collections.Counter(event['type'] for event in events)
+        self.by_type = collections.defaultdict(list)
+        for event in events:
+            self.by_type[event['type']].append(event)
+        battles = self.by_type['battle']
+        self.commander_counts = [len(event['commanders']) for event in battles]
+        commanders = [cmd for event in battles for cmd in event['commanders']]
+        self.allegiances = [cmd['allegiance'] for cmd in commanders]
+        self.victors = collections.Counter(event['victor'] for event in battles)
+        self.cmd_notes = [cmd['notes'] for cmd in commanders if 'notes' in cmd]
+        self.cmd_note_rate = len(self.cmd_notes) / len(commanders)
+        self.names = self._name_pools(commanders, extra_names)
+
+    def _name_pools(self, commanders: list[dict], extra: int) -> dict:
+        """Return {allegiance: (names, cumulative Zipf weights)}."""
+        pools = collections.defaultdict(list)
+        for cmd in commanders:
+            if cmd['name'] not in pools[cmd['allegiance']]:
+                pools[cmd['allegiance']].append(cmd['name'])
+        styles = [f'{title} {place}' for title in TITLES for place in PLACES]
+        for allegiance, names in pools.items():
+            names.extend(name for name in self.random.sample(styles, min(extra, len(styles)))
+                         if name not in names)
+        weights = {}
+        for allegiance, names in pools.items():
+            total = 0.0
+            cumulative = []
+            for rank in range(len(names)):
+                total += 1.0 / (rank + 1)
+                cumulative.append(total)
+            weights[allegiance] = (names, cumulative)
+        return weights
+
+    def _commander(self) -> dict:
+        allegiance = self.random.choice(self.allegiances)
+        names, cumulative = self.names[allegiance]
+        cmd = {'name': self.random.choices(names, cum_weights=cumulative)[0], 'allegiance': allegiance}
+        if self.cmd_notes and self.random.random() < self.cmd_note_rate:
+            cmd['notes'] = self.random.choice(self.cmd_notes)
+        return cmd
+
+    def _fields(self, event_type: str) -> dict:
+        """Sample each optional field of event_type from the real events of that type."""
+        events = self.by_type[event_type]
+        fields = {}
+        for key in sorted({key for event in events for key in event}):
+            if key in ('type', 'name', 'date', 'commanders', 'victor'):
+                continue
+            values = [event[key] for event in events if key in event]
+            if self.random.random() < len(values) / len(events):
+                fields[key] = self.random.choice(values)
+        return fields
+
+    def event(self, date: str, index: int) -> dict:
+        event_type = self.random.choices(list(self.types), list(self.types.values()))[0]
+        template = self.random.choice(self.by_type[event_type])
+        event = {'type': event_type, 'name': f"{template['name']} ({index})", 'date': date}
+        event.update(self._fields(event_type))
+        if event_type == 'battle':
+            commanders = [self._commander() for _ in range(self.random.choice(self.commander_counts))]
+            sides = {cmd['allegiance'] for cmd in commanders}
+            weights = [self.victors.get(side, 1) for side in sorted(sides)]
+            event['commanders'] = commanders
+            event['victor'] = self.random.choices(sorted(sides), weights)[0]
+        return event
+
+    def dataset(self, size: int) -> dict:
+        """Return a document with size events in date order across the sample's period."""
+        start, end = (int(year) for year in self.sample['period'].split('-'))
+        first = datetime.date(start, 1, 1).toordinal()
+        last = datetime.date(end, 12, 31).toordinal()
+        ordinals = sorted(self.random.randint(first, last) for _ in range(size))
+        events = [self.event(datetime.date.fromordinal(day).isoformat(), i)
+                  for i, day in enumerate(ordinals)]
+        return dict(self.sample, events=events)
+
+def load_sample() -> dict:
+    with open(SAMPLE_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+def _best(fn, repeat: int):
+    """Return (best wall time, last result) over repeat runs of fn."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _traced_peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _record(size: int, seconds: float, peak: int, output_bytes: int) -> dict:
+    return {
+        'seconds': round(seconds, 6),
+        'events_per_second': round(size / seconds, 1) if seconds else None,
+        'peak_bytes': peak,
+        'output_bytes': output_bytes,
+    }
+
+def bench_size(data: dict, repeat: int) -> dict:
+    """Run every benchmark on one dataset."""
+    size = len(data['events'])
+    factions = data['factions']
+    results = {}
+
+    def cards():
+        return [render_events.generate_event_html(event, factions) for event in data['events']]
+    seconds, fragments = _best(cards, repeat)
+    results['generate_event_html'] = _record(size, seconds, _traced_peak(cards),
+                                             sum(len(f.encode('utf-8')) for f in fragments))
+    del fragments
+
+    def page():
+        return render_events.generate_html(data)
+    seconds, html = _best(page, repeat)
+    results['generate_html'] = _record(size, seconds, _traced_peak(page), len(html.encode('utf-8')))
+    del html
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', encoding='utf-8', delete=False) as f:
+        json.dump(data, f)
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    cache_args = ['--cache', '--cache-dir', cache_dir]
+
+    def clear_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    try:
+        results['cli'] = _bench_cli(f.name, size, repeat)
+        results['cli_cache_cold'] = _bench_cli(f.name, size, repeat, cache_args, clear_cache)
+        _run_cli(f.name, cache_args)
+        results['cli_cache_warm'] = _bench_cli(f.name, size, repeat, cache_args)
+    finally:
+        os.unlink(f.name)
+        clear_cache()
+    return results
+
+def _run_cli(path: str, args=()) -> tuple[float, int, int]:
+    """Render path with render_events.py in a fresh process.
+
+    Returns (wall time, child max RSS in bytes, output bytes).
+    """
+    with open(path, 'rb') as stdin, tempfile.TemporaryFile() as stdout:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, str(RENDERER), *args], stdin=stdin, stdout=stdout)
+        _, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode:
+            raise RuntimeError(f'render_events.py exited with status {proc.returncode}')
+        output_bytes = stdout.seek(0, os.SEEK_END)
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return seconds, usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024), output_bytes
+
+def _bench_cli(path: str, size: int, repeat: int, args=(), setup=None) -> dict:
+    """Best of repeat command line runs; setup, if given, runs untimed before each."""
+    best = float('inf')
+    peak = output_bytes = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        seconds, peak, output_bytes = _run_cli(path, args)
+        best = min(best, seconds)
+    return _record(size, best, peak, output_bytes)
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return a line for each benchmark more than threshold slower than baseline."""
+    regressions = []
+    for size, benches in current['results'].items():
+        for name, result in benches.items():
+            base = baseline['results'].get(size, {}).get(name)
+            if not base or not base['seconds']:
+                continue
+            ratio = result['seconds'] / base['seconds']
+            if ratio > 1 + threshold:
+                regressions.append(f'{name} @ {size} events: {base["seconds"]:.4f}s -> '
+                                   f'{result["seconds"]:.4f}s ({ratio - 1:+.0%})')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark render_events.py on synthetic datasets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, metavar='N',
+                        help='Event counts to benchmark (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark; the best is kept')
+    parser.add_argument('--seed', type=int, default=0, help='Dataset generator seed')
+    parser.add_argument('--save', type=Path, metavar='FILE', help='Write results as JSON')
+    parser.add_argument('--compare', type=Path, metavar='FILE', help='Baseline results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown fraction reported as a regression (default: %(default)s)')
+    parser.add_argument('--generate', type=int, metavar='N', help='Print a dataset of N events and exit')
+    args = parser.parse_args()
+
+    generator = DatasetGenerator(load_sample(), args.seed)
+    if args.generate is not None:
+        json.dump(generator.dataset(args.generate), sys.stdout, indent=2, ensure_ascii=False)
+        return
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': {},
+    }
+    print(f"{'benchmark':<22}{'events':>10}{'seconds':>11}{'events/s':>13}{'peak MiB':>10}{'output MiB':>12}")
+    for size in args.sizes:
+        data = DatasetGenerator(load_sample(), args.seed).dataset(size)
+        results = bench_size(data, args.repeat)
+        report['results'][str(size)] = results
+        for name, result in results.items():
+            print(f"{name:<22}{size:>10}{result['seconds']:>11.4f}{result['events_per_second']:>13,.0f}"
+                  f"{result['peak_bytes'] / 2**20:>10.1f}{result['output_bytes'] / 2**20:>12.2f}")
+        del data
+
+    if args.save:
+        args.save.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
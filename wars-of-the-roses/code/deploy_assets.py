@@ -0,0 +1,72 @@
+"""
+Helpers for render_events.py --deploy builds.
+
+A deploy build writes the stylesheet and script once, under assets/ with a
+content hash in the file name, so every page and filtered variant published
+to the same directory shares one long-cacheable copy. Pages are minified
+and written with precompressed .gz (and .br, when the brotli package is
+installed) siblings for static servers that serve them directly (nginx
+gzip_static/brotli_static, Caddy precompressed, etc).
+
+Minification is deliberately conservative. It only removes whitespace that
+the templates' own indentation introduces and that cannot affect rendering.
+"""
+
+import gzip
+import hashlib
+import re
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from output_files import write_bytes_if_changed
+
+ASSETS_DIR = 'assets'
+
+_BETWEEN_TAGS = re.compile(r'>\s+<')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCT = re.compile(r'\s*([{};,>])\s*')
+
+def minify_html(html: str) -> str:
+    """Drop whitespace-only runs between tags, and at either end."""
+    return _BETWEEN_TAGS.sub('><', html).strip()
+
+def minify_css(css: str) -> str:
+    """Remove comments, collapse whitespace and trim it around punctuation."""
+    css = _CSS_COMMENT.sub('', css)
+    css = _CSS_SPACE.sub(' ', css)
+    return _CSS_PUNCT.sub(r'\1', css).replace(';}', '}').strip()
+
+def minify_js(js: str) -> str:
+    """Strip indentation and blank lines, keeping line breaks for ASI."""
+    return '\n'.join(line.strip() for line in js.splitlines() if line.strip())
+
+def write_precompressed(path: Path, data: bytes):
+    """Write path.gz, and path.br if brotli is available, next to path."""
+    # mtime=0 keeps the .gz bytes stable, so unchanged pages are not rewritten.
+    write_bytes_if_changed(Path(f'{path}.gz'), gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        write_bytes_if_changed(Path(f'{path}.br'), brotli.compress(data))
+
+def write_asset(out_dir: Path, name: str, suffix: str, text: str) -> str:
+    """Write a content-hashed asset under out_dir/assets; return its relative URL."""
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    filename = f'{name}.{digest}{suffix}'
+    assets = Path(out_dir) / ASSETS_DIR
+    assets.mkdir(parents=True, exist_ok=True)
+    path = assets / filename
+    write_bytes_if_changed(path, data)
+    write_precompressed(path, data)
+    return f'{ASSETS_DIR}/{filename}'
+
+def write_page(path: Path, html: str) -> int:
+    """Minify html and write it with its precompressed copies; return its size."""
+    data = minify_html(html).encode('utf-8')
+    write_bytes_if_changed(path, data)
+    write_precompressed(path, data)
+    return len(data)
@@ -0,0 +1,216 @@
+"""
+Compact in-memory model for large timelines.
+
+json.load turns every event and every commander into a dict that carries
+its own key strings and value strings. Here each event type is a __slots__
+record class instead. Names, allegiances, places and other repeated strings
+are interned in a per-dataset StringTable, and identical commanders are
+shared as a single Commander record. With pack_dates the ISO dates are held
+as day ordinals in an array('i') owned by the EventStore rather than as a
+string per event. A date that is not a full ISO date, such as a bare year,
+stays on its record as a string, with 0 in its place in the array.
+
+Records support the read-only mapping operations the renderer, templates and
+query layer use (record['name'], record.get('notes', ''), 'notes' in
+record), so they can be passed anywhere an event dict is read.
+"""
+
+import datetime
+from array import array
+from collections.abc import Sequence
+
+class Record:
+    """Base for slotted records that read like the dicts they replace.
+
+    Unset optional fields hold None and behave as missing keys. Keys outside
+    the record's fields are kept in extra.
+    """
+
+    __slots__ = ('extra',)
+    fields = ()
+
+    def __getitem__(self, key: str):
+        value = getattr(self, key, None) if key in self.fields else None
+        if value is None:
+            if self.extra and key in self.extra:
+                return self.extra[key]
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> list[str]:
+        keys = [key for key in self.fields if getattr(self, key, None) is not None]
+        return keys + list(self.extra or ())
+
+    def to_dict(self) -> dict:
+        """Return the record as plain JSON data."""
+        result = {}
+        for key in self.keys():
+            value = self[key]
+            if isinstance(value, tuple):
+                value = [item.to_dict() if isinstance(item, Record) else item for item in value]
+            result[key] = value
+        return result
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+class Commander(Record):
+    __slots__ = ('name', 'allegiance', 'notes')
+    fields = __slots__
+
+class Event(Record):
+    """An event of a type without its own record class."""
+
+    __slots__ = ('type', 'name', 'date', 'manner', 'notes')
+    fields = __slots__
+
+class Battle(Event):
+    __slots__ = ('commanders', 'victor')
+    fields = Event.fields + __slots__
+
+class Death(Event):
+    __slots__ = ('person', 'location', 'cause')
+    fields = Event.fields + __slots__
+
+class Accession(Event):
+    __slots__ = ('monarch', 'faction', 'location')
+    fields = Event.fields + __slots__
+
+class Treaty(Event):
+    __slots__ = ('parties',)
+    fields = Event.fields + __slots__
+
+RECORD_TYPES = {
+    'battle': Battle,
+    'death': Death,
+    'accession': Accession,
+    'treaty': Treaty,
+}
+
+class DatedEvent:
+    """A record read together with a date held outside it (see pack_dates)."""
+
+    __slots__ = ('record', 'date')
+
+    def __init__(self, record: Event, date: str):
+        self.record = record
+        self.date = date
+
+    def __getitem__(self, key: str):
+        return self.date if key == 'date' else self.record[key]
+
+    def get(self, key: str, default=None):
+        return self.date if key == 'date' else self.record.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key == 'date' or key in self.record
+
+    def keys(self) -> list[str]:
+        return ['date', *self.record.keys()]
+
+    def to_dict(self) -> dict:
+        return dict(self.record.to_dict(), date=self.date)
+
+class StringTable:
+    """Maps each distinct string to one shared instance."""
+
+    def __init__(self):
+        self.strings = {}
+
+    def __call__(self, value):
+        if isinstance(value, str):
+            return self.strings.setdefault(value, value)
+        return value
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class EventStore(Sequence):
+    """A sequence of event records, optionally with dates packed as ordinals."""
+
+    def __init__(self, records: list[Event], ordinals: array = None):
+        self.records = records
+        self.ordinals = ordinals
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        record = self.records[index]
+        if self.ordinals is None or not self.ordinals[index]:
+            return record
+        return DatedEvent(record, datetime.date.fromordinal(self.ordinals[index]).isoformat())
+
+def date_ordinal(date) -> int:
+    """Return the day ordinal of an ISO date string, or 0 if it is not one."""
+    try:
+        day = datetime.date.fromisoformat(date)
+    except (TypeError, ValueError):
+        return 0
+    # fromisoformat also reads forms such as 14550522 that would not round-trip.
+    return day.toordinal() if day.isoformat() == date else 0
+
+class EventStoreBuilder:
+    """Builds an EventStore from event dicts, interning as it goes."""
+
+    def __init__(self, pack_dates: bool = False):
+        self.strings = StringTable()
+        self.commanders = {}
+        self.parties = {}
+        self.records = []
+        self.ordinals = array('i') if pack_dates else None
+
+    def _commander(self, cmd: dict) -> Commander:
+        key = (cmd['name'], cmd['allegiance'], cmd.get('notes'))
+        commander = self.commanders.get(key)
+        if commander is None:
+            commander = Commander()
+            commander.name, commander.allegiance, commander.notes = map(self.strings, key)
+            commander.extra = None
+            extra = {k: v for k, v in cmd.items() if k not in Commander.fields}
+            if extra:
+                commander.extra = extra
+            else:
+                self.commanders[key] = commander
+        return commander
+
+    def add(self, event: dict):
+        """Convert one event dict to a record and append it."""
+        cls = RECORD_TYPES.get(event['type'], Event)
+        record = cls()
+        intern = self.strings
+        extra = None
+        for key in cls.fields:
+            setattr(record, key, None)
+        for key, value in event.items():
+            if key not in cls.fields:
+                extra = extra or {}
+                extra[key] = value
+            elif key == 'commanders':
+                record.commanders = tuple(self._commander(cmd) for cmd in value)
+            elif key == 'parties':
+                parties = tuple(map(intern, value))
+                record.parties = self.parties.setdefault(parties, parties)
+            else:
+                setattr(record, key, intern(value))
+        record.extra = extra
+        if self.ordinals is not None:
+            ordinal = date_ordinal(record.date)
+            self.ordinals.append(ordinal)
+            if ordinal:
+                record.date = None
+        self.records.append(record)
+
+    def build(self) -> EventStore:
+        return EventStore(self.records, self.ordinals)
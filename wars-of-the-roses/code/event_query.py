@@ -0,0 +1,145 @@
+"""
+Queries over a list of timeline events.
+
+Query.matches checks a single event, and Query.filter is a linear scan
+with it. The renderer's filter options use that: they answer one query per
+run, and a scan costs less than building an index.
+
+EventIndex is for callers that query the same events many times, such as
+render_events.py --views, which writes several filtered pages in one run.
+It is built in one pass over the events. It keeps the event dates in sorted
+order for bisect range lookups, and inverted indexes from type, allegiance,
+commander and person to event positions, so each query only touches the
+events it selects. Building it costs several scans, so it only pays off
+after several queries.
+
+Dates are ISO strings and may be given as prefixes: --from 1460 --to 1471
+selects everything from 1460-01-01 up to and including 1471-12-31. Other
+prefixes, such as 1460-5, would compare as strings and select the wrong
+events, so callers check them with is_date_prefix first.
+"""
+
+import datetime
+import re
+from bisect import bisect_left, bisect_right
+
+DATE_PREFIX_RE = re.compile(r'\d{4}(?:-(?:0[1-9]|1[0-2])(?:-\d{2})?)?')
+
+def is_date_prefix(value: str) -> bool:
+    """Return True if value is an ISO date, year-month (YYYY-MM) or year (YYYY)."""
+    if not DATE_PREFIX_RE.fullmatch(value):
+        return False
+    if len(value) > 7:
+        try:
+            datetime.date.fromisoformat(value)
+        except ValueError:
+            return False
+    return True
+
+def _fold(value: str) -> str:
+    return value.casefold()
+
+def event_allegiances(event: dict) -> set[str]:
+    """Return the allegiances an event is credited to (battle victor, accession faction)."""
+    allegiances = set()
+    if event.get('victor'):
+        allegiances.add(event['victor'])
+    if event.get('faction'):
+        allegiances.add(event['faction'])
+    return allegiances
+
+def event_commanders(event: dict) -> set[str]:
+    """Return the casefolded names of an event's commanders."""
+    return {_fold(cmd['name']) for cmd in event.get('commanders', ())}
+
+def event_people(event: dict) -> set[str]:
+    """Return the casefolded names of the people an event is about."""
+    people = {_fold(event[field]) for field in ('person', 'monarch') if event.get(field)}
+    people.update(_fold(party) for party in event.get('parties', ()))
+    return people
+
+class Query:
+    """A combination of filters. Each filter is a list of accepted values.
+
+    Values within one filter are alternatives; different filters must all
+    match. An empty or missing filter accepts everything.
+    """
+
+    def __init__(self, types: list[str] = None, date_from: str = None, date_to: str = None,
+                 allegiances: list[str] = None, commanders: list[str] = None,
+                 people: list[str] = None):
+        self.types = set(types or ())
+        self.date_from = date_from
+        self.date_to = date_to
+        self.allegiances = set(allegiances or ())
+        self.commanders = {_fold(name) for name in commanders or ()}
+        self.people = {_fold(name) for name in people or ()}
+
+    def __bool__(self) -> bool:
+        return bool(self.types or self.date_from or self.date_to or self.allegiances
+                    or self.commanders or self.people)
+
+    def matches(self, event: dict) -> bool:
+        """Return True if a single event passes every filter."""
+        date = event['date']
+        if self.types and event['type'] not in self.types:
+            return False
+        if self.date_from and date < self.date_from:
+            return False
+        if self.date_to and date[:len(self.date_to)] > self.date_to:
+            return False
+        if self.allegiances and not self.allegiances & event_allegiances(event):
+            return False
+        if self.commanders and not self.commanders & event_commanders(event):
+            return False
+        if self.people and not self.people & event_people(event):
+            return False
+        return True
+
+    def filter(self, events) -> list[dict]:
+        """Return the events that match, in their original order."""
+        return [event for event in events if self.matches(event)]
+
+class EventIndex:
+    """Date-sorted storage and inverted indexes over a list of events."""
+
+    def __init__(self, events: list[dict]):
+        self.events = events
+        self.order = sorted(range(len(events)), key=lambda i: events[i]['date'])
+        self.dates = [events[i]['date'] for i in self.order]
+        self.by_type = {}
+        self.by_allegiance = {}
+        self.by_commander = {}
+        self.by_person = {}
+        for i, event in enumerate(events):
+            self.by_type.setdefault(event['type'], set()).add(i)
+            for allegiance in event_allegiances(event):
+                self.by_allegiance.setdefault(allegiance, set()).add(i)
+            for name in event_commanders(event):
+                self.by_commander.setdefault(name, set()).add(i)
+            for name in event_people(event):
+                self.by_person.setdefault(name, set()).add(i)
+
+    def date_range(self, date_from: str = None, date_to: str = None) -> set[int]:
+        """Return positions of events dated within [date_from, date_to]."""
+        lo = bisect_left(self.dates, date_from) if date_from else 0
+        # Every date starting with date_to sorts before date_to + U+FFFF.
+        hi = bisect_right(self.dates, date_to + '\uffff') if date_to else len(self.dates)
+        return set(self.order[lo:hi])
+
+    def query(self, query: Query) -> list[dict]:
+        """Return the events matching query, in their original order."""
+        if not query:
+            return list(self.events)
+        candidates = []
+        for index, keys in ((self.by_type, query.types),
+                            (self.by_allegiance, query.allegiances),
+                            (self.by_commander, query.commanders),
+                            (self.by_person, query.people)):
+            if keys:
+                candidates.append(set().union(*(index.get(key, ()) for key in keys)))
+        if query.date_from or query.date_to:
+            candidates.append(self.date_range(query.date_from, query.date_to))
+        candidates.sort(key=len)
+        selected = candidates[0].intersection(*candidates[1:])
+        return [self.events[i] for i in sorted(selected)]
@@ -0,0 +1,168 @@
+"""
+Content-addressed on-disk cache of rendered event card fragments.
+
+Each fragment is stored under a hash of the event's marshal bytes, within a
+scope: the renderer version and every other input that changes the markup
+(the factions map, sprite mode). Editing one event in the source file
+therefore only re-renders that event on the next build. Marshal keeps the
+order of an event's keys, so reordering them in the source also counts as
+an edit; a changed key can only cause a miss, never a wrong hit.
+
+All the fragments of one scope live in a single pack file, read once when
+the scope is first used and rewritten once by flush() if anything was
+added. So a build costs two file operations however many events it has,
+not one or two per event. Packs are marshal data and are only ever read
+back by the same Python version; an unreadable pack counts as empty.
+
+When a pack grows past the size limit, the fragments this build did not use
+are dropped as it is written. evict() then deletes whole packs, least
+recently used first, until the cache is under the limit.
+
+The cache is off by default (render_events.py --cache). Keying an event and
+loading its fragment costs a few microseconds, about what the built-in
+templates take to render a card, so it pays off for expensive plugin
+templates rather than the built-in ones; use bench_render.py to check. It
+holds a whole pack in memory, so render_events.py does not allow it with
+--stream.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+from pathlib import Path
+from typing import Optional
+
+from output_files import atomic_write
+
+# Enough for a 100k-event timeline (about 340 MB of cards) in one pack.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+PACK_SUFFIX = '.pack'
+
+def default_cache_dir() -> Path:
+    """Return the per-user cache directory for rendered fragments."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'wars-of-the-roses' / 'fragments'
+
+def canonical_json(value) -> bytes:
+    """Serialise value so that equal JSON documents give equal bytes."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+def event_bytes(event) -> bytes:
+    """Serialise an event for keying, several times faster than canonical_json."""
+    # Compact event records (event_model) are keyed as the dicts they replace.
+    if hasattr(event, 'to_dict'):
+        event = event.to_dict()
+    # Version 2 has no back-references, so the bytes depend only on the content.
+    return marshal.dumps(event, 2)
+
+class _Pack:
+    """The fragments of one scope, held in memory between load and flush."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path, 'rb') as f:
+                entries = marshal.load(f)
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (OSError, EOFError, ValueError, TypeError):
+            # Missing, truncated or written by another Python version.
+            pass
+        self.used = set()
+        self.dirty = False
+
+class FragmentCache:
+    """Cache of rendered HTML fragments keyed by content hash."""
+
+    def __init__(self, directory: Path, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._packs = {}
+
+    def scope(self, *inputs) -> str:
+        """Return the scope covering the renderer version and shared inputs."""
+        return hashlib.sha256(canonical_json([self.version, *inputs])).hexdigest()
+
+    def key(self, scope: str, event: dict) -> tuple[str, bytes]:
+        """Return the cache key for one event rendered within scope."""
+        return scope, hashlib.blake2b(event_bytes(event), digest_size=16).digest()
+
+    def _pack(self, scope: str) -> _Pack:
+        pack = self._packs.get(scope)
+        if pack is None:
+            pack = self._packs[scope] = _Pack(self.directory / f'{scope}{PACK_SUFFIX}')
+        return pack
+
+    def get(self, key: tuple[str, bytes]) -> Optional[str]:
+        """Return the cached fragment for key, or None on a miss."""
+        scope, digest = key
+        pack = self._pack(scope)
+        fragment = pack.entries.get(digest)
+        if fragment is None:
+            self.misses += 1
+            return None
+        pack.used.add(digest)
+        self.hits += 1
+        return fragment
+
+    def put(self, key: tuple[str, bytes], fragment: str):
+        """Store fragment under key; it is written to disk by flush()."""
+        scope, digest = key
+        pack = self._pack(scope)
+        pack.entries[digest] = fragment
+        pack.used.add(digest)
+        pack.dirty = True
+
+    def flush(self):
+        """Write every pack that gained fragments, and mark the others as used."""
+        for pack in self._packs.values():
+            if not pack.dirty:
+                if pack.used:
+                    try:
+                        os.utime(pack.path)
+                    except OSError:
+                        pass
+                continue
+            entries = pack.entries
+            if sum(map(len, entries.values())) > self.max_bytes:
+                entries = {digest: entries[digest] for digest in pack.used}
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with atomic_write(pack.path, binary=True) as f:
+                marshal.dump(entries, f)
+            pack.dirty = False
+
+    def evict(self) -> int:
+        """Delete least recently used packs until the cache is under max_bytes.
+
+        Packs used by this build are kept. Returns the number of packs removed.
+        """
+        current = {pack.path for pack in self._packs.values()}
+        entries = []
+        total = 0
+        for path in self.directory.glob(f'*{PACK_SUFFIX}'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if path not in current:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Convert Markdown timelines such as ww2-timeline.md and french-revolutions.md
+to timeline JSON for render_events.py.
+
+The Markdown is read in one streaming pass:
+
+    # World War II Timeline          -> conflict "World War II"
+    ## 1940                          -> year of the bullets that follow
+    ## 1795 - 1799 Directory         -> years 1795-1799, era "Directory"
+    - May 26th. Start of Dunkirk evacuation. (Ends June 4th 1940.)
+    - 31st Jan Paulus surrenders at Stalingrad
+    - In Jan 1793 the Convention votes ...
+      - an indented bullet is added to the notes of the one above
+
+Each bullet becomes a schema "event" record. Its date comes from a leading
+day and month ("May 26th.", "31st Jan", "Feb 15th") or a leading month and
+year ("In Jan 1793", "1793 ..."), completed from the heading's year. An
+undated bullet takes the heading's first year. The precision field says
+whether the date is a day, a month or only a year. The first sentence is
+the name and the rest become the notes. A parenthesised "(Ends June 4th
+1940.)" or "(Started on July 10th 1940.)" also sets end_date or start_date;
+its text stays in the notes.
+
+The period is the range of years in the headings and leading dates. A quick
+first pass over the file finds it, so that it is written before the events.
+render_events.py --stream can then render each event as it arrives, and
+nothing is buffered on either side of the pipe.
+
+Usage:
+    python ingest_markdown.py ../../ww2-timeline.md > ww2.json
+    python ingest_markdown.py ../../ww2-timeline.md | python render_events.py > ww2.html
+    python ingest_markdown.py --html ../../ww2-timeline.md > ww2.html
+    python ingest_markdown.py --output-dir DIR [--html] [--jobs N] FILE ...
+
+Options:
+    --html         Render the page in-process with render_events.generate_html
+                   rather than writing JSON.
+    --output-dir DIR
+                   Batch mode: convert every FILE to DIR/<name>.json (or
+                   .html), in parallel across --jobs worker processes. Files
+                   are only replaced when their contents change.
+    --jobs N       Worker processes for batch mode (default: one per CPU).
+
+Lines that cannot be placed, such as a bullet before any year heading, are
+skipped and reported on stderr as FILE:LINE: message. A file with no years
+at all is an error; in batch mode the other files are still converted and
+the exit status is 1.
+"""
+
+import argparse
+import datetime
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import render_events
+
+MONTHS = {name: number for number, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+_MONTH = (r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?'
+          r'|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)')
+_DAY = r'(?:3[01]|[12]\d|[1-9])(?:st|nd|rd|th)?'
+_DAY_MONTH = (rf'(?:(?P<month>{_MONTH})\.?\s+(?P<day>{_DAY})'
+              rf'|(?P<day2>{_DAY})\s+(?P<month2>{_MONTH}))\b\.?(?:,?\s+(?P<year>\d{{4}}))?')
+
+TITLE_RE = re.compile(r'#\s+(?P<title>.+?)(?:\s+timeline)?\s*$', re.I)
+HEADING_RE = re.compile(r'##\s+(?P<start>\d{4})(?:\s*[-–]\s*(?P<end>\d{4}))?\s*(?P<era>.*?)\s*$')
+BULLET_RE = re.compile(r'(?P<indent>\s*)[-*+]\s+(?P<text>.*?)\s*$')
+LEADING_DAY_RE = re.compile(rf'{_DAY_MONTH}[.:,]?\s+', re.I)
+LEADING_YEAR_RE = re.compile(rf'(?:In\s+)?(?:(?P<month>{_MONTH})\s+)?(?P<year>\d{{4}})\b', re.I)
+DATE_RE = re.compile(rf'{_DAY_MONTH}', re.I)
+SPAN_RE = re.compile(r'\((?P<text>[^()]*?\b(?P<kind>ends|started)\b(?:\s+on)?\s+(?P<date>[^()]*?))\)', re.I)
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+(?=\S)')
+SPACE_BEFORE_PUNCT_RE = re.compile(r'\s+(?=[.,;:])')
+
+def _month(name: str) -> int:
+    return MONTHS[name[:3].lower()]
+
+def _day(text: str) -> int:
+    return int(text.rstrip('stndrh'))
+
+def parse_date(text: str, year: int = None):
+    """Parse "June 4th 1940" or "4th June" (in year) to an ISO date, or None."""
+    match = DATE_RE.match(text.strip())
+    if match is None:
+        return None
+    year = int(match['year']) if match['year'] else year
+    if year is None:
+        return None
+    try:
+        return datetime.date(year, _month(match['month'] or match['month2']),
+                             _day(match['day'] or match['day2'])).isoformat()
+    except ValueError:
+        return None
+
+class MarkdownTimeline:
+    """Streaming parser for one Markdown timeline.
+
+    scan_period() reads the file once to find the period. iter_document()
+    then yields the same ('member', key, value) and ('event', index, event)
+    items as render_events.iter_document, with 'conflict', 'factions' and
+    'period' before the events.
+    """
+
+    def __init__(self, name: str = None):
+        self.name = name
+        self.warnings = []
+        self.year = None
+        self.era = None
+        self.first_year = None
+        self.last_year = None
+        self.pending = None
+        self.count = 0
+
+    def _warn(self, line_no: int, message: str):
+        self.warnings.append((line_no, message))
+
+    def _see_year(self, year: int):
+        """Widen the period to include year."""
+        if self.first_year is None or year < self.first_year:
+            self.first_year = year
+        if self.last_year is None or year > self.last_year:
+            self.last_year = year
+
+    def scan_period(self, lines) -> str:
+        """Return the period, from the heading years and leading bullet dates.
+
+        Raises ValueError if there are none.
+        """
+        for line in lines:
+            if line.startswith('## '):
+                match = HEADING_RE.match(line)
+                if match:
+                    self._see_year(int(match['start']))
+                    if match['end']:
+                        self._see_year(int(match['end']))
+                continue
+            match = BULLET_RE.fullmatch(line.rstrip('\n'))
+            if match:
+                date = LEADING_DAY_RE.match(match['text']) or LEADING_YEAR_RE.match(match['text'])
+                if date and date['year']:
+                    self._see_year(int(date['year']))
+        if self.first_year is None:
+            raise ValueError('no year headings or dated bullets')
+        return f'{self.first_year}-{self.last_year}'
+
+    def _head(self, conflict: str, period: str):
+        return [('member', 'conflict', conflict), ('member', 'factions', {}),
+                ('member', 'period', period)]
+
+    def _event(self, text: str, line_no: int) -> dict:
+        """Turn the text of a top-level bullet into an event."""
+        precision = 'day'
+        match = LEADING_DAY_RE.match(text)
+        if match:
+            year = int(match['year']) if match['year'] else self.year
+            if year is None:
+                self._warn(line_no, 'day and month before any year heading')
+                return None
+            date = parse_date(match.group().rstrip(' .:,'), year)
+            if date is None:
+                self._warn(line_no, f'invalid date {match.group().strip()!r}')
+                return None
+            text = text[match.end():]
+        else:
+            match = LEADING_YEAR_RE.match(text)
+            if match:
+                precision = 'month' if match['month'] else 'year'
+                month = _month(match['month']) if match['month'] else 1
+                date = f"{int(match['year']):04d}-{month:02d}-01"
+            elif self.year is not None:
+                precision = 'year'
+                date = f'{self.year:04d}-01-01'
+            else:
+                self._warn(line_no, 'bullet before any year heading')
+                return None
+
+        event = {'type': 'event', 'name': '', 'date': date}
+        spans = []
+        for span in SPAN_RE.finditer(text):
+            value = parse_date(span['date'].rstrip('.'), int(date[:4]))
+            if value is not None:
+                event['end_date' if span['kind'].lower() == 'ends' else 'start_date'] = value
+            spans.append(span['text'].rstrip('.') + '.')
+        text = SPACE_BEFORE_PUNCT_RE.sub('', SPAN_RE.sub(' ', text)).strip()
+        name, *rest = SENTENCE_END_RE.split(text, 1)
+        event['name'] = name.rstrip('.')
+        notes = ' '.join([*rest, *spans])
+        if notes:
+            event['notes'] = notes
+        if precision != 'day':
+            event['precision'] = precision
+        if self.era:
+            event['era'] = self.era
+        return event
+
+    def _flush(self):
+        event, self.pending = self.pending, None
+        if event is not None:
+            index = self.count
+            self.count += 1
+            return ('event', index, event)
+        return None
+
+    def iter_document(self, lines, period: str):
+        """Yield the document's members and events as lines are read."""
+        conflict_seen = False
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip() or line.lstrip().startswith('!['):
+                continue
+            if line.startswith('## '):
+                item = self._flush()
+                if item:
+                    yield item
+                match = HEADING_RE.match(line)
+                if match is None:
+                    self._warn(line_no, f'heading without a year: {line.strip()!r}')
+                    self.year = self.era = None
+                    continue
+                self.year = int(match['start'])
+                self.era = match['era'] or None
+                continue
+            if line.startswith('# '):
+                if not conflict_seen:
+                    conflict_seen = True
+                    yield from self._head(TITLE_RE.match(line)['title'], period)
+                continue
+            match = BULLET_RE.fullmatch(line.rstrip('\n'))
+            if match is None:
+                self._warn(line_no, f'unrecognised line: {line.strip()!r}')
+                continue
+            if not conflict_seen:
+                conflict_seen = True
+                yield from self._head(self.name or 'Timeline', period)
+            text = match['text']
+            if match['indent'] and self.pending is not None:
+                notes = self.pending.get('notes')
+                self.pending['notes'] = f'{notes} {text}' if notes else text
+                continue
+            item = self._flush()
+            if item:
+                yield item
+            self.pending = self._event(text, line_no)
+        item = self._flush()
+        if item:
+            yield item
+        if not conflict_seen:
+            yield from self._head(self.name or 'Timeline', period)
+
+def write_json(items, out):
+    """Write document items as timeline JSON, each event as soon as it arrives.
+
+    The events must arrive together, as MarkdownTimeline.iter_document
+    yields them.
+    """
+    separator = '{\n'
+    events = 0
+    in_events = False
+    for kind, key, value in items:
+        if kind == 'event':
+            if not in_events:
+                out.write(f'{separator}  "events": [')
+                separator = ',\n'
+                in_events = True
+            body = json.dumps(value, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+            out.write(f'{"," if events else ""}\n    {body}')
+            events += 1
+            continue
+        if in_events:
+            out.write('\n  ]')
+            in_events = False
+        out.write(f'{separator}  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+        separator = ',\n'
+    if in_events:
+        out.write('\n  ]')
+    elif not events:
+        out.write(f'{separator}  "events": []')
+    out.write('\n}\n')
+
+def read_document(items) -> dict:
+    """Collect document items into a timeline dict."""
+    data = {'events': []}
+    for kind, key, value in items:
+        if kind == 'event':
+            data['events'].append(value)
+        else:
+            data[key] = value
+    return data
+
+def convert(path: Path, out, html: bool = False) -> tuple[int, list[tuple[int, str]]]:
+    """Convert one Markdown file to JSON, or to an HTML page, written to out.
+
+    Returns the number of events and the parser's warnings. Raises
+    ValueError if the file has no years to date events by.
+    """
+    timeline = MarkdownTimeline(Path(path).stem)
+    with open(path, encoding='utf-8') as lines:
+        period = timeline.scan_period(lines)
+        lines.seek(0)
+        items = timeline.iter_document(lines, period)
+        if html:
+            out.write(render_events.generate_html(read_document(items)))
+        else:
+            write_json(items, out)
+    return timeline.count, timeline.warnings
+
+def convert_file(path: Path, out_dir: Path, html: bool = False):
+    """Batch worker: convert path to out_dir/<stem>.json or .html."""
+    target = out_dir / f"{Path(path).stem}{'.html' if html else '.json'}"
+    with render_events.open_output(target) as out:
+        count, warnings = convert(path, out, html)
+    return target, count, warnings
+
+def _report(path, warnings):
+    for line_no, message in warnings:
+        print(f'{path}:{line_no}: {message}', file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert Markdown timelines to timeline JSON')
+    parser.add_argument('files', type=Path, nargs='+', metavar='FILE', help='Markdown timeline')
+    parser.add_argument('--html', action='store_true', help='Write rendered HTML instead of JSON')
+    parser.add_argument('--output-dir', type=Path, metavar='DIR',
+                        help='Convert every FILE into DIR (required for more than one FILE)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes for --output-dir (default: one per CPU)')
+    args = parser.parse_args()
+
+    if args.output_dir is None:
+        if len(args.files) > 1:
+            parser.error('converting more than one FILE needs --output-dir')
+        try:
+            _, warnings = convert(args.files[0], sys.stdout, args.html)
+        except ValueError as e:
+            print(f'{args.files[0]}: {e}', file=sys.stderr)
+            sys.exit(1)
+        _report(args.files[0], warnings)
+        return
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    failed = False
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(convert_file, path, args.output_dir, args.html) for path in args.files]
+        for path, future in zip(args.files, futures):
+            try:
+                target, count, warnings = future.result()
+            except ValueError as e:
+                print(f'{path}: {e}', file=sys.stderr)
+                failed = True
+                continue
+            _report(path, warnings)
+            print(f'{path} -> {target} ({count} events)', file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Atomic, change-aware file writes.
+
+Every file the renderer writes goes through atomic_write(): --output pages,
+--paginate and --views pages, deploy assets and their precompressed
+copies, the fragment cache's packs and the ingester's batch outputs. Each is
+replaced atomically with the same mode, and a file that would not change is
+left untouched.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+def _same_contents(a, b) -> bool:
+    """Return True if the files a and b hold the same bytes."""
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            block = fa.read(1 << 16)
+            if block != fb.read(1 << 16):
+                return False
+            if not block:
+                return True
+
+@contextmanager
+def atomic_write(path: Path, binary: bool = False):
+    """Open a temporary file that replaces path when the block succeeds.
+
+    If path already holds exactly what was written it is left untouched,
+    which keeps its mtime stable for make-style tools and static site
+    deploys. Replaced files get mode 0644 rather than mkstemp's 0600. On
+    error the temporary file is removed and path is unchanged.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            yield f
+        if path.exists() and _same_contents(path, tmp):
+            os.unlink(tmp)
+        else:
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def write_bytes_if_changed(path: Path, data: bytes) -> bool:
+    """Atomically write data to path unless it already holds exactly data.
+
+    Returns True if the file was written.
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_write(path, binary=True) as f:
+        f.write(data)
+    return True
@@ -5,342 +5,1346 @@ Reads JSON from stdin and outputs HTML to stdout.
 
 Usage:
     cat wars_of_the_roses.json | python render_events.py [--type TYPE ...]
+        [--from DATE] [--to DATE] [--faction FACTION ...] [--commander NAME ...]
+        [--person NAME ...] [--plugin MODULE ...] [--validate [all|first]]
+        [--sprites] [--stream] [--virtual] [--paginate year|N --output-dir DIR]
+        [--views FILE --output-dir DIR]
+        [--deploy] [--compact [--pack-dates]] [--jobs N]
+        [--output FILE] [--cache [--cache-dir DIR] [--cache-size MB]]
+        [--metrics FILE] [--profile FILE]
 
 Options:
-    --type TYPE    Filter by event type (battle, death, accession, treaty)
-                   Can be specified multiple times. If omitted, shows all events.
+    --type TYPE    Filter by event type (battle, accession, death, treaty,
+                   event, or a type registered by a plugin). Can be specified
+                   multiple times. If omitted, shows all events.
+    --from DATE, --to DATE
+                   Only events in this inclusive date range. Partial dates
+                   such as 1460 or 1471-05 cover the whole year or month.
+    --faction FACTION
+                   Only battles won by FACTION and accessions of FACTION.
+    --commander NAME
+                   Only battles where NAME commanded (case-insensitive).
+    --person NAME  Only deaths, accessions and treaties naming NAME.
+                   Filters of different kinds combine; repeated values of one
+                   kind are alternatives.
+    --plugin MODULE
+                   Import MODULE before rendering. A plugin adds an event type
+                   by decorating a CardTemplate subclass with
+                   register_event_type; it gets its own filter button. The
+                   bundled schema only knows the built-in types.
+    --validate [all|first]
+                   Check the input against wars_of_the_roses_schema.json and
+                   exit with status 1, listing every error (or only the
+                   first), instead of rendering invalid data.
+    --sprites      Define each faction rose once as an SVG <symbol> and
+                   reference it with <use>, instead of inlining every rose.
+    --stream       Parse the events array incrementally and write each card as
+                   soon as it is rendered, so memory stays flat for large files.
+    --virtual      Embed the cards in a compact JSON data island, with each
+                   distinct piece of template markup or text stored once and
+                   each event as a row of references to them, and only put
+                   the cards near the viewport into the DOM. Filtering works
+                   on the data. Always uses sprite roses.
+    --paginate year|N --output-dir DIR
+                   Write one page per year, or per N events, into DIR, with
+                   navigation between pages. The first page is index.html.
+    --views FILE --output-dir DIR
+                   Write several filtered pages in one run. FILE is a JSON
+                   object from output file name to filters, named like the
+                   options above, e.g. {"battles.html": {"type": "battle"},
+                   "york.html": {"faction": ["york"], "from": "1460"}}. The
+                   events are indexed once and every view is queried from
+                   the index.
+    --deploy       With --output, --paginate or --views, write the stylesheet
+                   and script once as content-hashed files under assets/ next
+                   to the output, link them from each page, minify the HTML
+                   and write precompressed .gz (and .br, if the brotli package
+                   is installed) copies of everything for a static server.
+    --compact      Load the events in one streaming pass into typed __slots__
+                   records with commander, person and faction strings
+                   interned, instead of dicts. Uses a fraction of the memory
+                   for large merged datasets.
+    --pack-dates   With --compact, also store dates as day ordinals in an
+                   array rather than as one string per event.
+    --jobs N       Render event cards in N worker processes. Output is
+                   identical to the serial renderer. Not used with --stream.
+    --output FILE  Write to FILE instead of stdout. The file is only replaced
+                   when the rendered page differs from its current contents.
+    --cache        Reuse rendered cards from an on-disk fragment cache, keyed
+                   by event content. Off by default (--no-cache): it pays off
+                   for expensive plugin templates, not the built-in cards, so
+                   only turn it on where bench_render.py shows a gain. Not
+                   used with --stream.
+    --cache-dir DIR
+                   Where cached fragments live (default: $XDG_CACHE_HOME or
+                   ~/.cache, under wars-of-the-roses/fragments).
+    --cache-size MB
+                   Evict least recently used fragments beyond this size
+                   (default 512, enough for a 100k-event timeline).
+    --metrics FILE Write JSON with time per stage (parse, validate, query,
+                   render, assemble, write), per-type event counts and render
+                   time, the slowest events, peak RSS and output bytes.
+    --profile FILE Run under cProfile and dump stats for pstats/snakeviz.
 """
 
 import argparse
+import cProfile
+import hashlib
+import importlib
 import json
+import re
 import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from deploy_assets import minify_css, minify_html, minify_js, write_asset, write_page
+from event_model import EventStoreBuilder
+from event_query import EventIndex, Query, is_date_prefix
+from fragment_cache import DEFAULT_MAX_BYTES, FragmentCache, default_cache_dir
+from output_files import atomic_write
+from render_metrics import MeteredWriter, RenderMetrics, stage, timed_iter
+from validate_events import ValidationError, Validator, load_validator
+
+FACTION_COLORS = {
+    'york': '#FFFFFF',
+    'lancaster': '#DC143C',
+    'tudor': '#228B22',
+    'uncertain': '#808080'
+}
 
 def get_faction_color(allegiance: str) -> str:
     """Return color for each faction."""
-    colors = {
-        'york': '#FFFFFF',
-        'lancaster': '#DC143C',
-        'tudor': '#228B22',
-        'uncertain': '#808080'
-    }
-    return colors.get(allegiance, '#666666')
+    return FACTION_COLORS.get(allegiance, '#666666')
+
+# Petal rings (rx, ry, fill, stroke, start angle), centre gradient stops and
+# centre radius for each rose. Unknown allegiances use the 'uncertain' rose.
+ROSES = {
+    'york': {
+        'petals': [(22, 38, '#FFFFFF', '#DDD', 0)],
+        'centre': ('#FFD700', '#DAA520'),
+        'centre_r': 12,
+    },
+    'lancaster': {
+        'petals': [(22, 38, '#DC143C', '#8B0000', 0)],
+        'centre': ('#FFD700', '#DAA520'),
+        'centre_r': 12,
+    },
+    'tudor': {
+        'petals': [(22, 40, '#DC143C', '#8B0000', 0), (14, 26, '#FFFFFF', '#DDD', 36)],
+        'centre': ('#FFD700', '#DAA520'),
+        'centre_r': 10,
+    },
+    'uncertain': {
+        'petals': [(22, 38, '#808080', '#666', 0)],
+        'centre': ('#999', '#666'),
+        'centre_r': 12,
+    },
+}
+
+def rose_key(allegiance: str) -> str:
+    """Return the ROSES key used to draw an allegiance."""
+    return allegiance if allegiance in ROSES else 'uncertain'
+
+def _rose_parts(allegiance: str, gradient_id: str, indent: str) -> tuple[str, str]:
+    """Return (gradient, petals) markup for a rose, indented for nesting."""
+    rose = ROSES[rose_key(allegiance)]
+    start, stop = rose['centre']
+    gradient = f'''{indent}<radialGradient id="{gradient_id}" cx="50%" cy="50%" r="50%">
+{indent}    <stop offset="0%" style="stop-color:{start}"/>
+{indent}    <stop offset="100%" style="stop-color:{stop}"/>
+{indent}</radialGradient>'''
+    ellipses = ''.join(
+        f'''
+{indent}    <ellipse rx="{rx}" ry="{ry}" fill="{fill}" stroke="{stroke}" stroke-width="1" transform="rotate({offset + 72 * i})"/>'''
+        for rx, ry, fill, stroke, offset in rose['petals']
+        for i in range(5)
+    )
+    petals = f'''{indent}<g transform="translate(50,50)">{ellipses}
+{indent}    <circle r="{rose['centre_r']}" fill="url(#{gradient_id})"/>
+{indent}</g>'''
+    return gradient, petals
 
 def get_rose_svg(allegiance: str, size: int = 20) -> str:
     """Return inline SVG rose for each faction."""
-    if allegiance == 'york':
-        return f'''<svg width="{size}" height="{size}" viewBox="0 0 100 100" style="vertical-align: middle;">
-            <defs>
-                <radialGradient id="yorkCenter" cx="50%" cy="50%" r="50%">
-                    <stop offset="0%" style="stop-color:#FFD700"/>
-                    <stop offset="100%" style="stop-color:#DAA520"/>
-                </radialGradient>
-            </defs>
-            <g transform="translate(50,50)">
-                <ellipse rx="22" ry="38" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(0)"/>
-                <ellipse rx="22" ry="38" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(72)"/>
-                <ellipse rx="22" ry="38" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(144)"/>
-                <ellipse rx="22" ry="38" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(216)"/>
-                <ellipse rx="22" ry="38" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(288)"/>
-                <circle r="12" fill="url(#yorkCenter)"/>
-            </g>
-        </svg>'''
-    elif allegiance == 'lancaster':
-        return f'''<svg width="{size}" height="{size}" viewBox="0 0 100 100" style="vertical-align: middle;">
-            <defs>
-                <radialGradient id="lancasterCenter" cx="50%" cy="50%" r="50%">
-                    <stop offset="0%" style="stop-color:#FFD700"/>
-                    <stop offset="100%" style="stop-color:#DAA520"/>
-                </radialGradient>
-            </defs>
-            <g transform="translate(50,50)">
-                <ellipse rx="22" ry="38" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(0)"/>
-                <ellipse rx="22" ry="38" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(72)"/>
-                <ellipse rx="22" ry="38" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(144)"/>
-                <ellipse rx="22" ry="38" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(216)"/>
-                <ellipse rx="22" ry="38" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(288)"/>
-                <circle r="12" fill="url(#lancasterCenter)"/>
-            </g>
-        </svg>'''
-    elif allegiance == 'tudor':
-        return f'''<svg width="{size}" height="{size}" viewBox="0 0 100 100" style="vertical-align: middle;">
-            <defs>
-                <radialGradient id="tudorCenter" cx="50%" cy="50%" r="50%">
-                    <stop offset="0%" style="stop-color:#FFD700"/>
-                    <stop offset="100%" style="stop-color:#DAA520"/>
-                </radialGradient>
-            </defs>
-            <g transform="translate(50,50)">
-                <ellipse rx="22" ry="40" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(0)"/>
-                <ellipse rx="22" ry="40" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(72)"/>
-                <ellipse rx="22" ry="40" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(144)"/>
-                <ellipse rx="22" ry="40" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(216)"/>
-                <ellipse rx="22" ry="40" fill="#DC143C" stroke="#8B0000" stroke-width="1" transform="rotate(288)"/>
-                <ellipse rx="14" ry="26" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(36)"/>
-                <ellipse rx="14" ry="26" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(108)"/>
-                <ellipse rx="14" ry="26" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(180)"/>
-                <ellipse rx="14" ry="26" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(252)"/>
-                <ellipse rx="14" ry="26" fill="#FFFFFF" stroke="#DDD" stroke-width="1" transform="rotate(324)"/>
-                <circle r="10" fill="url(#tudorCenter)"/>
-            </g>
-        </svg>'''
-    else:
-        return f'''<svg width="{size}" height="{size}" viewBox="0 0 100 100" style="vertical-align: middle;">
+    gradient, petals = _rose_parts(allegiance, f"{rose_key(allegiance)}Center", ' ' * 12)
+    return f'''<svg width="{size}" height="{size}" viewBox="0 0 100 100" style="vertical-align: middle;">
             <defs>
-                <radialGradient id="uncertainCenter" cx="50%" cy="50%" r="50%">
-                    <stop offset="0%" style="stop-color:#999"/>
-                    <stop offset="100%" style="stop-color:#666"/>
-                </radialGradient>
+{textwrap.indent(gradient, '    ')}
             </defs>
-            <g transform="translate(50,50)">
-                <ellipse rx="22" ry="38" fill="#808080" stroke="#666" stroke-width="1" transform="rotate(0)"/>
-                <ellipse rx="22" ry="38" fill="#808080" stroke="#666" stroke-width="1" transform="rotate(72)"/>
-                <ellipse rx="22" ry="38" fill="#808080" stroke="#666" stroke-width="1" transform="rotate(144)"/>
-                <ellipse rx="22" ry="38" fill="#808080" stroke="#666" stroke-width="1" transform="rotate(216)"/>
-                <ellipse rx="22" ry="38" fill="#808080" stroke="#666" stroke-width="1" transform="rotate(288)"/>
-                <circle r="12" fill="url(#uncertainCenter)"/>
-            </g>
+{petals}
         </svg>'''
 
+def get_rose_sprites() -> str:
+    """Return a hidden SVG block defining one <symbol> per rose.
+
+    Gradient ids are namespaced per rose so they stay unique in the page.
+    """
+    symbols = ""
+    for allegiance in ROSES:
+        gradient, petals = _rose_parts(allegiance, f"rose-{allegiance}-centre", ' ' * 12)
+        symbols += f'''
+        <symbol id="rose-{allegiance}" viewBox="0 0 100 100">
+{gradient}
+{petals}
+        </symbol>'''
+    return f'''<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0" style="position: absolute;" aria-hidden="true">{symbols}
+    </svg>'''
+
+def get_rose_use(allegiance: str, size: int = 20) -> str:
+    """Return an SVG rose referencing the symbol from get_rose_sprites()."""
+    return f'''<svg width="{size}" height="{size}" style="vertical-align: middle;"><use href="#rose-{rose_key(allegiance)}"/></svg>'''
+
 def get_event_type_style(event_type: str) -> tuple[str, str]:
     """Return (background_color, text_color) for event type badges."""
-    styles = {
-        'battle': ('#8B0000', '#fff'),
-        'death': ('#2c2c2c', '#fff'),
-        'accession': ('#FFD700', '#000'),
-        'treaty': ('#4169E1', '#fff'),
-    }
-    return styles.get(event_type, ('#666', '#fff'))
-
-def generate_event_html(event: dict, factions: dict) -> str:
-    """Generate HTML for a single event based on its type."""
-    date = event['date']
-    name = event['name']
-    event_type = event['type']
-    notes = event.get('notes', '')
-    manner = event.get('manner', '')
-    
-    type_bg, type_fg = get_event_type_style(event_type)
-    type_badge = f"""<span class="type-badge" style="background-color: {type_bg}; color: {type_fg}">{event_type.title()}</span>"""
-    
-    if event_type == 'battle':
-        victor = event['victor']
-        victor_name = factions.get(victor, victor.title())
-        victor_color = get_faction_color(victor)
-        victor_rose = get_rose_svg(victor, 20)
-        
+    template = EVENT_TEMPLATES.get(event_type)
+    return template.style if template else CardTemplate.style
+
+class RenderContext:
+    """Per-page rendering state: the factions map, rose mode and memoised markup.
+
+    Roses, faction names and faction badges depend only on the allegiance, so
+    each is built once per page rather than once per event.
+    """
+
+    def __init__(self, factions: dict, sprites: bool = False):
+        self.factions = factions
+        self.sprites = sprites
+        self._rose_svg = get_rose_use if sprites else get_rose_svg
+        self._roses = {}
+        self._names = {}
+        self._badges = {}
+        self._groups = {}
+
+    def rose(self, allegiance: str, size: int) -> str:
+        key = (allegiance, size)
+        if key not in self._roses:
+            self._roses[key] = self._rose_svg(allegiance, size)
+        return self._roses[key]
+
+    def faction_name(self, allegiance: str) -> str:
+        if allegiance not in self._names:
+            self._names[allegiance] = self.factions.get(allegiance, allegiance.title())
+        return self._names[allegiance]
+
+    def faction_badge(self, allegiance: str) -> str:
+        """Return the rose-and-name badge shown next to the type badge."""
+        if allegiance not in self._badges:
+            self._badges[allegiance] = f"""<span class="victor-badge">{self.rose(allegiance, 20)}<span class="victor-name"> {self.faction_name(allegiance)}</span></span>"""
+        return self._badges[allegiance]
+
+    def faction_group(self, allegiance: str) -> str:
+        """Return the opening markup of a commanders-by-faction group."""
+        if allegiance not in self._groups:
+            self._groups[allegiance] = f"""
+                <div class="faction-group">
+                    <span class="faction-badge">{self.rose(allegiance, 24)} {self.faction_name(allegiance)}</span>
+                    <ul class="commander-list">"""
+        return self._groups[allegiance]
+
+_contexts = {}
+
+def get_render_context(factions: dict, sprites: bool = False) -> RenderContext:
+    """Return the RenderContext for factions, reusing it while the same dict is passed."""
+    context = _contexts.get(sprites)
+    if context is None or context.factions is not factions:
+        context = _contexts[sprites] = RenderContext(factions, sprites)
+    return context
+
+class CardTemplate:
+    """Renders the event card for one event type.
+
+    Subclasses set event_type, style and border_color and override details(),
+    and badge() or border() where those depend on the event. The type badge is
+    built once, when the template is created.
+    """
+
+    event_type = None
+    style = ('#666', '#fff')
+    border_color = '#666'
+
+    def __init__(self, event_type: str = None):
+        if event_type is not None:
+            self.event_type = event_type
+        type_bg, type_fg = self.style
+        self.type_badge = f"""<span class="type-badge" style="background-color: {type_bg}; color: {type_fg}">{self.event_type.title()}</span>"""
+        self.card_open = f"""
+    <div class="event-card" data-type="{self.event_type}" style="border-left-color: """
+
+    def badge(self, event: dict, context: RenderContext) -> str:
+        """Return markup shown after the type badge (e.g. the victor)."""
+        return ""
+
+    def border(self, event: dict, context: RenderContext) -> str:
+        """Return the card's left border color."""
+        return self.border_color
+
+    def details(self, event: dict, context: RenderContext) -> str:
+        """Return the markup revealed when the card is expanded."""
+        return f"<p class='battle-notes'>{event.get('notes', '')}</p>"
+
+    def render(self, event: dict, context: RenderContext) -> str:
+        return f"""{self.card_open}{self.border(event, context)}">
+        <div class="event-header" onclick="toggleEvent(this)">
+            <div class="event-summary">
+                <span class="event-date">{event['date']}</span>
+                <div class="type-victor-group">{self.type_badge}{self.badge(event, context)}</div>
+                <span class="event-name">{event['name']}</span>
+            </div>
+            <div class="expand-icon">&#9660;</div>
+        </div>
+        <div class="event-details">{self.details(event, context)}</div>
+    </div>"""
+
+# Registered templates by event type, in the order their filter buttons appear.
+EVENT_TEMPLATES = {}
+_fallback_templates = {}
+
+def register_event_type(template_class: type) -> type:
+    """Register a CardTemplate subclass for its event_type.
+
+    Usable as a class decorator. Plugins loaded with --plugin call this to add
+    event types without touching the renderer.
+    """
+    template = template_class()
+    EVENT_TEMPLATES[template.event_type] = template
+    return template_class
+
+_plugins = []
+
+def load_plugins(modules) -> None:
+    """Import plugin modules, which register their templates on import."""
+    for module in modules:
+        importlib.import_module(module)
+        if module not in _plugins:
+            _plugins.append(module)
+
+def get_template(event_type: str) -> CardTemplate:
+    """Return the template for event_type, or a plain notes-only one."""
+    template = EVENT_TEMPLATES.get(event_type)
+    if template is None:
+        template = _fallback_templates.get(event_type)
+        if template is None:
+            template = _fallback_templates[event_type] = CardTemplate(event_type)
+    return template
+
+@register_event_type
+class BattleTemplate(CardTemplate):
+    event_type = 'battle'
+    style = ('#8B0000', '#fff')
+
+    def badge(self, event, context):
+        return context.faction_badge(event['victor'])
+
+    def border(self, event, context):
+        return get_faction_color(event['victor'])
+
+    def details(self, event, context):
         commanders_by_side = {}
         for cmd in event['commanders']:
-            allegiance = cmd['allegiance']
-            if allegiance not in commanders_by_side:
-                commanders_by_side[allegiance] = []
             cmd_text = cmd['name']
             if 'notes' in cmd:
                 cmd_text += f" <span class='cmd-note'>({cmd['notes']})</span>"
-            commanders_by_side[allegiance].append(cmd_text)
-        
-        commanders_html = ""
-        for allegiance, cmds in commanders_by_side.items():
-            faction_name = factions.get(allegiance, allegiance.title())
-            rose_svg = get_rose_svg(allegiance, 24)
-            commanders_html += f"""
-                <div class="faction-group">
-                    <span class="faction-badge">{rose_svg} {faction_name}</span>
-                    <ul class="commander-list">{''.join(f'<li>{cmd}</li>' for cmd in cmds)}</ul>
+            commanders_by_side.setdefault(cmd['allegiance'], []).append(cmd_text)
+
+        commanders_html = ''.join(
+            f"""{context.faction_group(allegiance)}{''.join(f'<li>{cmd}</li>' for cmd in cmds)}</ul>
                 </div>"""
-        
-        victor_badge = f"""<span class="victor-badge">{victor_rose}<span class="victor-name"> {victor_name}</span></span>"""
-        details_html = f"""<div class="commanders-section"><h3>Commanders</h3>{commanders_html}</div><p class="battle-notes">{notes}</p>"""
-        border_color = victor_color
-        
-    elif event_type == 'death':
-        person = event['person']
-        location = event.get('location', 'Unknown')
-        cause = event.get('cause', 'Unknown')
-        victor_badge = ""
-        details_html = f"""<div class="event-details-section">
-            <p><strong>Person:</strong> {person}</p>
-            <p><strong>Location:</strong> {location}</p>
-            <p><strong>Cause:</strong> {cause}</p>
-        </div><p class="battle-notes">{notes}</p>"""
-        border_color = '#2c2c2c'
-        
-    elif event_type == 'accession':
-        monarch = event['monarch']
+            for allegiance, cmds in commanders_by_side.items())
+        return f"""<div class="commanders-section"><h3>Commanders</h3>{commanders_html}</div><p class="battle-notes">{event.get('notes', '')}</p>"""
+
+@register_event_type
+class AccessionTemplate(CardTemplate):
+    event_type = 'accession'
+    style = ('#FFD700', '#000')
+    border_color = '#FFD700'
+
+    def badge(self, event, context):
+        faction = event.get('faction', '')
+        return context.faction_badge(faction) if faction else ""
+
+    def border(self, event, context):
         faction = event.get('faction', '')
+        return get_faction_color(faction) if faction else self.border_color
+
+    def details(self, event, context):
+        manner = event.get('manner', '')
         location = event.get('location', '')
-        
-        if faction:
-            faction_rose = get_rose_svg(faction, 20)
-            faction_name = factions.get(faction, faction.title())
-            victor_badge = f"""<span class="victor-badge">{faction_rose}<span class="victor-name"> {faction_name}</span></span>"""
-            border_color = get_faction_color(faction)
-        else:
-            victor_badge = ""
-            border_color = '#FFD700'
-        
         manner_html = f"<p><strong>Manner:</strong> {manner.title()}</p>" if manner else ""
         location_html = f"<p><strong>Location:</strong> {location}</p>" if location else ""
-        details_html = f"""<div class="event-details-section">
-            <p><strong>Monarch:</strong> {monarch}</p>
+        return f"""<div class="event-details-section">
+            <p><strong>Monarch:</strong> {event['monarch']}</p>
             {manner_html}{location_html}
-        </div><p class="battle-notes">{notes}</p>"""
-        
-    elif event_type == 'treaty':
-        parties = event.get('parties', [])
-        victor_badge = ""
-        details_html = f"""<div class="event-details-section">
-            <p><strong>Parties:</strong> {', '.join(parties)}</p>
-        </div><p class="battle-notes">{notes}</p>"""
-        border_color = '#4169E1'
-    
-    else:
-        victor_badge = ""
-        details_html = f"<p class='battle-notes'>{notes}</p>"
-        border_color = '#666'
-    
+        </div><p class="battle-notes">{event.get('notes', '')}</p>"""
+
+@register_event_type
+class DeathTemplate(CardTemplate):
+    event_type = 'death'
+    style = ('#2c2c2c', '#fff')
+    border_color = '#2c2c2c'
+
+    def details(self, event, context):
+        return f"""<div class="event-details-section">
+            <p><strong>Person:</strong> {event['person']}</p>
+            <p><strong>Location:</strong> {event.get('location', 'Unknown')}</p>
+            <p><strong>Cause:</strong> {event.get('cause', 'Unknown')}</p>
+        </div><p class="battle-notes">{event.get('notes', '')}</p>"""
+
+@register_event_type
+class TreatyTemplate(CardTemplate):
+    event_type = 'treaty'
+    style = ('#4169E1', '#fff')
+    border_color = '#4169E1'
+
+    def details(self, event, context):
+        return f"""<div class="event-details-section">
+            <p><strong>Parties:</strong> {', '.join(event.get('parties', []))}</p>
+        </div><p class="battle-notes">{event.get('notes', '')}</p>"""
+
+@register_event_type
+class EventTemplate(CardTemplate):
+    """A plain dated event, such as the ones ingest_markdown.py writes."""
+
+    event_type = 'event'
+    style = ('#708090', '#fff')
+    border_color = '#708090'
+
+    def details(self, event, context):
+        rows = ''.join(f"<p><strong>{label}:</strong> {event[key]}</p>"
+                       for key, label in (('era', 'Era'), ('start_date', 'Started'), ('end_date', 'Ended'))
+                       if key in event)
+        section = f"""<div class="event-details-section">{rows}</div>""" if rows else ""
+        return f"""{section}<p class="battle-notes">{event.get('notes', '')}</p>"""
+
+def generate_event_html(event: dict, factions: dict, sprites: bool = False) -> str:
+    """Generate HTML for a single event using the template for its type.
+
+    With sprites=True roses reference the symbols from get_rose_sprites()
+    instead of being inlined.
+    """
+    return get_template(event['type']).render(event, get_render_context(factions, sprites))
+
+def _filter_buttons() -> str:
+    buttons = ''
+    for event_type, template in EVENT_TEMPLATES.items():
+        bg, fg = template.style
+        text = f" --btn-text: {fg};" if fg != '#fff' else ""
+        buttons += f"""
+                        <button class="filter-btn" data-type="{event_type}" style="--btn-color: {bg};{text}">{event_type.title()}</button>"""
+    return buttons
+
+PAGE_STYLE = """
+        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%); min-height: 100vh; color: #e0e0e0; line-height: 1.6; }
+        .container { max-width: 700px; margin: 0 auto; padding: 40px 20px; }
+        @media (max-width: 768px) { .container { padding: 20px 15px; } }
+        header { text-align: center; margin-bottom: 50px; }
+        @media (max-width: 768px) { header { margin-bottom: 30px; } }
+        h1 { font-size: 2.5rem; color: #fff; margin-bottom: 10px; text-shadow: 2px 2px 4px rgba(0,0,0,0.3); }
+        @media (max-width: 768px) { h1 { font-size: 1.8rem; } }
+        .subtitle { font-size: 1.2rem; color: #aaa; }
+        @media (max-width: 768px) { .subtitle { font-size: 1rem; } }
+        .legend { display: flex; justify-content: center; gap: 40px; margin: 30px 0; flex-wrap: wrap; }
+        .legend-section { display: flex; flex-direction: column; align-items: center; gap: 10px; }
+        .legend-title { font-size: 0.75rem; color: #888; text-transform: uppercase; letter-spacing: 1px; }
+        .legend-items { display: flex; gap: 15px; flex-wrap: wrap; justify-content: center; }
+        .legend-item { display: flex; align-items: center; gap: 6px; font-size: 0.9rem; }
+        .filter-buttons { display: flex; gap: 8px; flex-wrap: wrap; justify-content: center; }
+        .filter-btn { --btn-color: #555; --btn-text: #fff; background: transparent; border: 2px solid var(--btn-color); color: #aaa; padding: 6px 14px; border-radius: 20px; font-size: 0.85rem; font-weight: 500; cursor: pointer; transition: all 0.2s ease; }
+        .filter-btn:hover { background: var(--btn-color); color: var(--btn-text); }
+        .filter-btn.active { background: var(--btn-color); color: var(--btn-text); box-shadow: 0 2px 8px rgba(0,0,0,0.3); }
+        .timeline { position: relative; padding-left: 30px; }
+        @media (max-width: 768px) { .timeline { padding-left: 20px; } }
+        .timeline::before { content: ''; position: absolute; left: 0; top: 0; bottom: 0; width: 3px; background: linear-gradient(to bottom, #DC143C, #FFFFFF, #228B22); border-radius: 3px; }
+        .event-card { background: rgba(255,255,255,0.05); border-radius: 8px; margin-bottom: 8px; border-left: 4px solid; position: relative; transition: transform 0.2s, box-shadow 0.2s; overflow: hidden; }
+        .event-card:hover { transform: translateX(5px); box-shadow: 0 10px 30px rgba(0,0,0,0.3); }
+        .event-header { display: flex; justify-content: space-between; align-items: center; padding: 8px 15px; cursor: pointer; user-select: none; }
+        .event-summary { flex: 1; display: flex; align-items: center; gap: 10px; flex-wrap: wrap; }
+        @media (max-width: 768px) { .event-summary { gap: 6px; } }
+        .expand-icon { font-size: 1rem; color: #888; transition: transform 0.3s ease; margin-left: 15px; }
+        .event-card.expanded .expand-icon { transform: rotate(180deg); }
+        .event-details { max-height: 0; overflow: hidden; transition: max-height 0.3s ease; padding: 0 15px; }
+        .event-card.expanded .event-details { max-height: 1000px; padding: 0 15px 15px 15px; }
+        .event-card::before { content: ''; position: absolute; left: -38px; top: 15px; width: 10px; height: 10px; background: #fff; border-radius: 50%; border: 3px solid #1a1a2e; }
+        @media (max-width: 768px) { .event-card::before { left: -28px; width: 8px; height: 8px; } }
+        .event-date { font-size: 1rem; color: #ddd; font-family: monospace; font-weight: 600; min-width: 80px; }
+        @media (max-width: 768px) { .event-date { font-size: 0.85rem; min-width: 70px; } }
+        .type-badge { padding: 2px 8px; border-radius: 4px; font-size: 0.65rem; font-weight: normal; text-transform: uppercase; letter-spacing: 0.5px; opacity: 0.7; }
+        .event-name { font-size: 1rem; color: #fff; font-weight: 500; flex: 1; min-width: 120px; }
+        @media (max-width: 768px) { .event-name { font-size: 0.9rem; min-width: 100px; } }
+        .commanders-section { margin-bottom: 15px; }
+        .commanders-section h3 { font-size: 0.85rem; text-transform: uppercase; color: #888; margin-bottom: 10px; letter-spacing: 1px; }
+        .faction-group { margin-bottom: 10px; }
+        .faction-badge { display: inline-flex; align-items: center; gap: 6px; padding: 3px 10px 3px 3px; border-radius: 4px; font-size: 0.8rem; font-weight: bold; margin-bottom: 5px; background: rgba(255,255,255,0.1); }
+        .commander-list { list-style: none; padding-left: 15px; }
+        .commander-list li { font-size: 0.95rem; padding: 2px 0; color: #ccc; }
+        .cmd-note { font-size: 0.8rem; color: #f0ad4e; font-style: italic; }
+        .type-victor-group { display: flex; align-items: center; gap: 6px; }
+        .victor-badge { display: inline-flex; align-items: center; gap: 5px; padding: 3px 10px 3px 3px; border-radius: 12px; font-weight: bold; font-size: 0.8rem; white-space: nowrap; background: rgba(255,255,255,0.1); }
+        @media (max-width: 768px) { .victor-badge { padding: 3px; gap: 0; } .victor-badge .victor-name { display: none; } }
+        .event-details-section { margin-bottom: 15px; }
+        .event-details-section p { margin: 5px 0; color: #ccc; }
+        .event-details-section strong { color: #aaa; }
+        .battle-notes { font-style: italic; color: #aaa; border-top: 1px solid rgba(255,255,255,0.1); padding-top: 15px; margin-top: 10px; }
+        footer { text-align: center; margin-top: 50px; padding-top: 20px; border-top: 1px solid rgba(255,255,255,0.1); color: #666; }"""
+
+def _faction_legend(factions: dict, rose_svg) -> str:
+    """Return the legend section with a rose for each faction, or nothing if there are none."""
+    if not factions:
+        return ""
+    # Known roses first, in their usual order, then any other factions.
+    keys = [key for key in ROSES if key in factions] + [key for key in factions if key not in ROSES]
+    items = ''.join(f"""
+                        <div class="legend-item">{rose_svg(key, 28)}<span>{factions[key]}</span></div>"""
+                    for key in keys)
     return f"""
-    <div class="event-card" data-type="{event_type}" style="border-left-color: {border_color}">
-        <div class="event-header" onclick="toggleEvent(this)">
-            <div class="event-summary">
-                <span class="event-date">{date}</span>
-                <div class="type-victor-group">{type_badge}{victor_badge}</div>
-                <span class="event-name">{name}</span>
-            </div>
-            <div class="expand-icon">&#9660;</div>
-        </div>
-        <div class="event-details">{details_html}</div>
-    </div>"""
+                <div class="legend-section">
+                    <span class="legend-title">Factions</span>
+                    <div class="legend-items">{items}
+                    </div>
+                </div>"""
 
-def generate_html(data: dict, type_filter: list[str] = None) -> str:
-    """Generate HTML visualization of the events."""
-    events_html = ""
-    for event in data['events']:
-        if type_filter and event['type'] not in type_filter:
-            continue
-        events_html += generate_event_html(event, data['factions'])
-    
+def generate_page_header(conflict: str, period: str, factions: dict, type_filter: list[str] = None,
+                         sprites: bool = False, extra_style: str = "", stylesheet: str = None) -> str:
+    """Generate the page up to and including the opening timeline <div>.
+
+    The title and heading name the conflict, and the faction legend lists
+    the factions map (it is left out when the map is empty). The stylesheet
+    is inlined unless a stylesheet URL is given.
+    """
+    if stylesheet:
+        styles = f'<link rel="stylesheet" href="{stylesheet}">'
+    else:
+        styles = f"<style>{PAGE_STYLE}{extra_style}\n    </style>"
+    rose_svg = get_rose_use if sprites else get_rose_svg
+    sprites_html = f"\n    {get_rose_sprites()}" if sprites else ""
     filter_desc = ', '.join(t.title() + 's' for t in type_filter) if type_filter else 'All Events'
 
-    html = f"""<!DOCTYPE html>
+    return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Wars of the Roses - Timeline</title>
-    <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%); min-height: 100vh; color: #e0e0e0; line-height: 1.6; }}
-        .container {{ max-width: 700px; margin: 0 auto; padding: 40px 20px; }}
-        @media (max-width: 768px) {{ .container {{ padding: 20px 15px; }} }}
-        header {{ text-align: center; margin-bottom: 50px; }}
-        @media (max-width: 768px) {{ header {{ margin-bottom: 30px; }} }}
-        h1 {{ font-size: 2.5rem; color: #fff; margin-bottom: 10px; text-shadow: 2px 2px 4px rgba(0,0,0,0.3); }}
-        @media (max-width: 768px) {{ h1 {{ font-size: 1.8rem; }} }}
-        .subtitle {{ font-size: 1.2rem; color: #aaa; }}
-        @media (max-width: 768px) {{ .subtitle {{ font-size: 1rem; }} }}
-        .legend {{ display: flex; justify-content: center; gap: 40px; margin: 30px 0; flex-wrap: wrap; }}
-        .legend-section {{ display: flex; flex-direction: column; align-items: center; gap: 10px; }}
-        .legend-title {{ font-size: 0.75rem; color: #888; text-transform: uppercase; letter-spacing: 1px; }}
-        .legend-items {{ display: flex; gap: 15px; flex-wrap: wrap; justify-content: center; }}
-        .legend-item {{ display: flex; align-items: center; gap: 6px; font-size: 0.9rem; }}
-        .filter-buttons {{ display: flex; gap: 8px; flex-wrap: wrap; justify-content: center; }}
-        .filter-btn {{ --btn-color: #555; --btn-text: #fff; background: transparent; border: 2px solid var(--btn-color); color: #aaa; padding: 6px 14px; border-radius: 20px; font-size: 0.85rem; font-weight: 500; cursor: pointer; transition: all 0.2s ease; }}
-        .filter-btn:hover {{ background: var(--btn-color); color: var(--btn-text); }}
-        .filter-btn.active {{ background: var(--btn-color); color: var(--btn-text); box-shadow: 0 2px 8px rgba(0,0,0,0.3); }}
-        .timeline {{ position: relative; padding-left: 30px; }}
-        @media (max-width: 768px) {{ .timeline {{ padding-left: 20px; }} }}
-        .timeline::before {{ content: ''; position: absolute; left: 0; top: 0; bottom: 0; width: 3px; background: linear-gradient(to bottom, #DC143C, #FFFFFF, #228B22); border-radius: 3px; }}
-        .event-card {{ background: rgba(255,255,255,0.05); border-radius: 8px; margin-bottom: 8px; border-left: 4px solid; position: relative; transition: transform 0.2s, box-shadow 0.2s; overflow: hidden; }}
-        .event-card:hover {{ transform: translateX(5px); box-shadow: 0 10px 30px rgba(0,0,0,0.3); }}
-        .event-header {{ display: flex; justify-content: space-between; align-items: center; padding: 8px 15px; cursor: pointer; user-select: none; }}
-        .event-summary {{ flex: 1; display: flex; align-items: center; gap: 10px; flex-wrap: wrap; }}
-        @media (max-width: 768px) {{ .event-summary {{ gap: 6px; }} }}
-        .expand-icon {{ font-size: 1rem; color: #888; transition: transform 0.3s ease; margin-left: 15px; }}
-        .event-card.expanded .expand-icon {{ transform: rotate(180deg); }}
-        .event-details {{ max-height: 0; overflow: hidden; transition: max-height 0.3s ease; padding: 0 15px; }}
-        .event-card.expanded .event-details {{ max-height: 1000px; padding: 0 15px 15px 15px; }}
-        .event-card::before {{ content: ''; position: absolute; left: -38px; top: 15px; width: 10px; height: 10px; background: #fff; border-radius: 50%; border: 3px solid #1a1a2e; }}
-        @media (max-width: 768px) {{ .event-card::before {{ left: -28px; width: 8px; height: 8px; }} }}
-        .event-date {{ font-size: 1rem; color: #ddd; font-family: monospace; font-weight: 600; min-width: 80px; }}
-        @media (max-width: 768px) {{ .event-date {{ font-size: 0.85rem; min-width: 70px; }} }}
-        .type-badge {{ padding: 2px 8px; border-radius: 4px; font-size: 0.65rem; font-weight: normal; text-transform: uppercase; letter-spacing: 0.5px; opacity: 0.7; }}
-        .event-name {{ font-size: 1rem; color: #fff; font-weight: 500; flex: 1; min-width: 120px; }}
-        @media (max-width: 768px) {{ .event-name {{ font-size: 0.9rem; min-width: 100px; }} }}
-        .commanders-section {{ margin-bottom: 15px; }}
-        .commanders-section h3 {{ font-size: 0.85rem; text-transform: uppercase; color: #888; margin-bottom: 10px; letter-spacing: 1px; }}
-        .faction-group {{ margin-bottom: 10px; }}
-        .faction-badge {{ display: inline-flex; align-items: center; gap: 6px; padding: 3px 10px 3px 3px; border-radius: 4px; font-size: 0.8rem; font-weight: bold; margin-bottom: 5px; background: rgba(255,255,255,0.1); }}
-        .commander-list {{ list-style: none; padding-left: 15px; }}
-        .commander-list li {{ font-size: 0.95rem; padding: 2px 0; color: #ccc; }}
-        .cmd-note {{ font-size: 0.8rem; color: #f0ad4e; font-style: italic; }}
-        .type-victor-group {{ display: flex; align-items: center; gap: 6px; }}
-        .victor-badge {{ display: inline-flex; align-items: center; gap: 5px; padding: 3px 10px 3px 3px; border-radius: 12px; font-weight: bold; font-size: 0.8rem; white-space: nowrap; background: rgba(255,255,255,0.1); }}
-        @media (max-width: 768px) {{ .victor-badge {{ padding: 3px; gap: 0; }} .victor-badge .victor-name {{ display: none; }} }}
-        .event-details-section {{ margin-bottom: 15px; }}
-        .event-details-section p {{ margin: 5px 0; color: #ccc; }}
-        .event-details-section strong {{ color: #aaa; }}
-        .battle-notes {{ font-style: italic; color: #aaa; border-top: 1px solid rgba(255,255,255,0.1); padding-top: 15px; margin-top: 10px; }}
-        footer {{ text-align: center; margin-top: 50px; padding-top: 20px; border-top: 1px solid rgba(255,255,255,0.1); color: #666; }}
-    </style>
+    <title>{conflict} - Timeline</title>
+    {styles}
 </head>
-<body>
+<body>{sprites_html}
     <div class="container">
         <header>
-            <h1>&#9876;&#65039; Wars of the Roses</h1>
-            <p class="subtitle">{data['period']} &bull; {filter_desc}</p>
-            <div class="legend">
-                <div class="legend-section">
-                    <span class="legend-title">Factions</span>
-                    <div class="legend-items">
-                        <div class="legend-item">{get_rose_svg('york', 28)}<span>York</span></div>
-                        <div class="legend-item">{get_rose_svg('lancaster', 28)}<span>Lancaster</span></div>
-                        <div class="legend-item">{get_rose_svg('tudor', 28)}<span>Tudor</span></div>
-                    </div>
-                </div>
+            <h1>&#9876;&#65039; {conflict}</h1>
+            <p class="subtitle">{period} &bull; {filter_desc}</p>
+            <div class="legend">{_faction_legend(factions, rose_svg)}
                 <div class="legend-section">
                     <span class="legend-title">Filter by Event Type</span>
                     <div class="filter-buttons">
-                        <button class="filter-btn active" data-type="all">All</button>
-                        <button class="filter-btn" data-type="battle" style="--btn-color: #8B0000;">Battle</button>
-                        <button class="filter-btn" data-type="accession" style="--btn-color: #FFD700; --btn-text: #000;">Accession</button>
-                        <button class="filter-btn" data-type="death" style="--btn-color: #2c2c2c;">Death</button>
-                        <button class="filter-btn" data-type="treaty" style="--btn-color: #4169E1;">Treaty</button>
+                        <button class="filter-btn active" data-type="all">All</button>{_filter_buttons()}
                     </div>
                 </div>
             </div>
         </header>
-        <div class="timeline">{events_html}</div>
-        <footer><p>Wars of the Roses Timeline &bull; Data Visualization</p></footer>
-    </div>
-    <script>
-        function toggleEvent(headerElement) {{
+        <div class="timeline">"""
+
+FILTER_SCRIPT = """
+        function toggleEvent(headerElement) {
             const card = headerElement.closest('.event-card');
             card.classList.toggle('expanded');
-        }}
-        document.querySelectorAll('.filter-btn').forEach(btn => {{
-            btn.addEventListener('click', () => {{
+        }
+        document.querySelectorAll('.filter-btn').forEach(btn => {
+            btn.addEventListener('click', () => {
                 document.querySelectorAll('.filter-btn').forEach(b => b.classList.remove('active'));
                 btn.classList.add('active');
                 const filterType = btn.dataset.type;
-                document.querySelectorAll('.event-card').forEach(card => {{
+                document.querySelectorAll('.event-card').forEach(card => {
                     card.style.display = (filterType === 'all' || card.dataset.type === filterType) ? '' : 'none';
-                }});
-            }});
-        }});
-    </script>
+                });
+            });
+        });"""
+
+# Renders cards from the events-data island in chunks as they approach the
+# viewport, and empties chunks far outside it (keeping their measured height),
+# so the DOM holds only a few hundred cards however long the timeline is.
+# Filtering rebuilds the list of row indices instead of touching every card.
+VIRTUAL_SCRIPT = """
+        const DATA = JSON.parse(document.getElementById('events-data').textContent);
+        const PARTS = DATA.parts;
+        const EVENTS = DATA.events;
+        const CHUNK = 50;
+        const timeline = document.querySelector('.timeline');
+        const sentinel = document.createElement('div');
+        const expanded = new Set();
+        let view = [];
+        let next = 0;
+        function toggleEvent(headerElement) {
+            const card = headerElement.closest('.event-card');
+            const index = +card.dataset.index;
+            if (card.classList.toggle('expanded')) expanded.add(index); else expanded.delete(index);
+        }
+        function card(row) {
+            let html = '';
+            for (let k = 1; k < row.length; k++) html += PARTS[row[k]];
+            return html;
+        }
+        function fill(chunk) {
+            const start = +chunk.dataset.start;
+            const rows = view.slice(start, start + CHUNK);
+            chunk.innerHTML = rows.map(i => card(EVENTS[i])).join('');
+            Array.from(chunk.children).forEach((card, k) => {
+                card.dataset.index = rows[k];
+                if (expanded.has(rows[k])) card.classList.add('expanded');
+            });
+            chunk.style.height = '';
+            chunk.dataset.filled = '1';
+        }
+        function empty(chunk) {
+            chunk.style.height = chunk.offsetHeight + 'px';
+            chunk.textContent = '';
+            chunk.dataset.filled = '';
+        }
+        const chunkObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    if (!entry.target.dataset.filled) fill(entry.target);
+                } else if (entry.target.dataset.filled) {
+                    empty(entry.target);
+                }
+            });
+        }, { rootMargin: '2000px 0px' });
+        const sentinelObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) append();
+        }, { rootMargin: '1000px 0px' });
+        function append() {
+            if (next >= view.length) return;
+            const chunk = document.createElement('div');
+            chunk.className = 'event-chunk';
+            chunk.dataset.start = next;
+            next += CHUNK;
+            fill(chunk);
+            timeline.insertBefore(chunk, sentinel);
+            chunkObserver.observe(chunk);
+            // Re-observing reports the sentinel again, appending until it is out of range.
+            sentinelObserver.unobserve(sentinel);
+            sentinelObserver.observe(sentinel);
+        }
+        function show(filterType) {
+            chunkObserver.disconnect();
+            timeline.textContent = '';
+            timeline.appendChild(sentinel);
+            view = [];
+            EVENTS.forEach((row, i) => {
+                if (filterType === 'all' || row[0] === filterType) view.push(i);
+            });
+            next = 0;
+            append();
+        }
+        document.querySelectorAll('.filter-btn').forEach(btn => {
+            btn.addEventListener('click', () => {
+                document.querySelectorAll('.filter-btn').forEach(b => b.classList.remove('active'));
+                btn.classList.add('active');
+                show(btn.dataset.type);
+            });
+        });
+        show('all');"""
+
+PAGER_STYLE = """
+        .pager { display: flex; flex-wrap: wrap; justify-content: center; gap: 6px; margin-top: 30px; }
+        .pager a, .pager span { color: #aaa; text-decoration: none; padding: 4px 10px; border: 1px solid #555; border-radius: 4px; font-size: 0.85rem; }
+        .pager a:hover { background: #555; color: #fff; }
+        .pager a[aria-current] { background: #555; color: #fff; }
+        .pager span { border-color: transparent; }"""
+
+def generate_page_footer(conflict: str, after_timeline: str = "", script: str = FILTER_SCRIPT,
+                         script_src: str = None) -> str:
+    """Generate the page from the closing timeline </div> to the end.
+
+    The script is inlined unless a script_src URL is given.
+    """
+    scripts = f'<script src="{script_src}"></script>' if script_src else f"<script>{script}\n    </script>"
+    return f"""</div>{after_timeline}
+        <footer><p>{conflict} Timeline &bull; Data Visualization</p></footer>
+    </div>
+    {scripts}
 </body>
 </html>"""
-    return html
+
+def _render_chunk(events: list[dict], factions: dict, sprites: bool) -> list[str]:
+    """Render a run of events (process pool worker)."""
+    return [generate_event_html(event, factions, sprites) for event in events]
+
+def _render_timed(events: list[dict], factions: dict, sprites: bool) -> list[tuple[str, float]]:
+    """Render a run of events, with each one's render time (for --metrics)."""
+    results = []
+    for event in events:
+        start = time.perf_counter()
+        fragment = generate_event_html(event, factions, sprites)
+        results.append((fragment, time.perf_counter() - start))
+    return results
+
+def _render_many(events: list[dict], factions: dict, sprites: bool, jobs: int,
+                 metrics: RenderMetrics = None) -> list[str]:
+    """Render event cards in order, optionally across a pool of jobs processes.
+
+    Events are split into contiguous chunks, a few per worker so uneven
+    chunks balance out, and the fragments come back in input order.
+    """
+    worker = _render_chunk if metrics is None else _render_timed
+    if jobs <= 1 or len(events) < 2:
+        results = worker(events, factions, sprites)
+    else:
+        size = -(-len(events) // (jobs * 4))
+        chunks = [events[i:i + size] for i in range(0, len(events), size)]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=load_plugins,
+                                 initargs=(tuple(_plugins),)) as executor:
+            results = [result
+                       for chunk in executor.map(worker, chunks,
+                                                 [factions] * len(chunks), [sprites] * len(chunks))
+                       for result in chunk]
+    if metrics is None:
+        return results
+    for event, (_, seconds) in zip(events, results):
+        metrics.record_event(event, seconds)
+    return [fragment for fragment, _ in results]
+
+def render_cards(events: list[dict], factions: dict, sprites: bool = False, jobs: int = 1,
+                 cache: FragmentCache = None, metrics: RenderMetrics = None) -> list[str]:
+    """Render event cards in order, reusing fragments from cache when given.
+
+    Only cache misses are rendered, across jobs processes if jobs > 1, and
+    recorded in metrics.
+    """
+    if cache is None:
+        return _render_many(events, factions, sprites, jobs, metrics)
+    scope = cache.scope(factions, sprites)
+    keys = [cache.key(scope, event) for event in events]
+    fragments = [cache.get(key) for key in keys]
+    missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+    rendered = _render_many([events[i] for i in missing], factions, sprites, jobs, metrics)
+    for i, fragment in zip(missing, rendered):
+        fragments[i] = fragment
+        cache.put(keys[i], fragment)
+    return fragments
+
+def generate_html(data: dict, type_filter: list[str] = None, sprites: bool = False,
+                  jobs: int = 1, cache: FragmentCache = None, metrics: RenderMetrics = None,
+                  assets: tuple[str, str] = None) -> str:
+    """Generate HTML visualization of the events.
+
+    assets is an optional (stylesheet URL, script URL) pair from
+    write_deploy_assets() to link instead of inlining.
+    """
+    stylesheet, script_src = assets or (None, None)
+    events = [event for event in data['events'] if not type_filter or event['type'] in type_filter]
+    with stage(metrics, 'render'):
+        cards = render_cards(events, data['factions'], sprites, jobs, cache, metrics)
+    with stage(metrics, 'assemble'):
+        return ''.join([generate_page_header(data['conflict'], data['period'], data['factions'],
+                                             type_filter, sprites, stylesheet=stylesheet),
+                        *cards, generate_page_footer(data['conflict'], script_src=script_src)])
+
+def iter_document(stream, chunk_size: int = 1 << 16):
+    """Incrementally parse a timeline document from a text stream.
+
+    Yields ('member', key, value) for each top-level member other than
+    'events', and ('event', index, event) for each item of the 'events'
+    array, reading at most one event ahead of the consumer.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                raise ValueError('Unexpected end of JSON input')
+
+    def expect(char: str):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {pos}, found {buf[pos]!r}")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # A number cut by the buffer edge decodes as its prefix ("1460."
+            # of 1460.25 gives 1460), so only accept one followed by a delimiter.
+            if (type(result) in (int, float) and (end == len(buf) or buf[end] not in ',]} \t\r\n')
+                    and fill()):
+                continue
+            pos = end
+            return result
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = value()
+        if not isinstance(key, str):
+            raise ValueError(f'Expected object key, got {key!r}')
+        expect(':')
+        if key == 'events':
+            expect('[')
+            index = 0
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield 'event', index, value()
+                    index += 1
+                    if peek() == ']':
+                        pos += 1
+                        break
+                    expect(',')
+        else:
+            yield 'member', key, value()
+        if peek() == '}':
+            return
+        expect(',')
+
+def _validate_item(validator: Validator, kind: str, key, item, fail_fast: bool,
+                   errors: list) -> bool:
+    """Check one item from iter_document, collecting problems in errors.
+
+    Returns False if the item is invalid; raises at once if fail_fast.
+    """
+    if kind == 'member':
+        problems = validator.validate_member(key, item, fail_fast)
+    else:
+        problems = validator.validate_event(item, key, fail_fast)
+    if problems and fail_fast:
+        raise ValidationError(problems)
+    errors.extend(problems)
+    return not problems
+
+def _check_members(validator: Validator, meta: dict, fail_fast: bool, errors: list):
+    """Raise ValidationError for errors, adding any required member missing from meta."""
+    # An empty events array yields nothing, so its presence is not checked here.
+    errors.extend(('', f'missing required property {key!r}')
+                  for key in validator.required if key != 'events' and key not in meta)
+    if errors:
+        raise ValidationError(errors[:1] if fail_fast else errors)
+
+def load_compact(stream, pack_dates: bool = False, validator: Validator = None,
+                 fail_fast: bool = False) -> dict:
+    """Load a timeline as a compact EventStore (see event_model) in one streaming pass.
+
+    Each event is validated, when a validator is given, and converted as it
+    is parsed, so the full dict form of the events never exists at once.
+    """
+    meta = {}
+    errors = []
+    builder = EventStoreBuilder(pack_dates)
+    for kind, key, item in iter_document(stream):
+        if validator is not None:
+            valid = _validate_item(validator, kind, key, item, fail_fast, errors)
+            if not valid and kind == 'event':
+                continue
+        if kind == 'member':
+            meta[key] = item
+        else:
+            builder.add(item)
+    if validator is not None:
+        _check_members(validator, meta, fail_fast, errors)
+    return dict(meta, events=builder.build())
+
+# Top-level members the page header needs, so --stream waits for them.
+HEADER_MEMBERS = ('conflict', 'period', 'factions')
+
+def stream_html(stream, out, type_filter: list[str] = None, sprites: bool = False,
+                query: Query = None, validator: Validator = None, fail_fast: bool = False,
+                metrics: RenderMetrics = None):
+    """Render a timeline from a JSON text stream to out, one event at a time.
+
+    When given, query is applied to each event as it arrives. With a
+    validator, each member and event is checked as it arrives; invalid events
+    are not rendered and ValidationError is raised once the input has been
+    read, or at the first problem if fail_fast.
+
+    The header is written as soon as 'conflict', 'period' and 'factions' are
+    known. Events that arrive before all three are held back until they are.
+    """
+    meta = {}
+    pending = []
+    started = False
+    errors = []
+    document = iter_document(stream)
+    if metrics is not None:
+        document = timed_iter(document, metrics, 'parse')
+    for kind, key, item in document:
+        if validator is not None:
+            start = time.perf_counter()
+            valid = _validate_item(validator, kind, key, item, fail_fast, errors)
+            if metrics is not None:
+                metrics.add('validate', time.perf_counter() - start)
+            if not valid and kind == 'event':
+                continue
+        if kind == 'member':
+            meta[key] = item
+        elif type_filter and item['type'] not in type_filter:
+            continue
+        elif query and not query.matches(item):
+            continue
+        else:
+            pending.append(item)
+        if not started and all(key in meta for key in HEADER_MEMBERS):
+            out.write(generate_page_header(meta['conflict'], meta['period'], meta['factions'],
+                                           type_filter, sprites))
+            started = True
+        if started and pending:
+            for event in pending:
+                start = time.perf_counter()
+                fragment = generate_event_html(event, meta['factions'], sprites)
+                if metrics is not None:
+                    seconds = time.perf_counter() - start
+                    metrics.add('render', seconds)
+                    metrics.record_event(event, seconds)
+                out.write(fragment)
+            pending.clear()
+    if validator is not None:
+        _check_members(validator, meta, fail_fast, errors)
+    if not started:
+        missing = [key for key in HEADER_MEMBERS if key not in meta]
+        raise KeyError(', '.join(missing))
+    out.write(generate_page_footer(meta['conflict']))
+
+def renderer_version() -> str:
+    """Return a hash of the renderer and plugin sources, used to scope cached fragments."""
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    for module in _plugins:
+        digest.update(Path(sys.modules[module].__file__).read_bytes())
+    return digest.hexdigest()
+
+def open_output(path):
+    """Open a temporary file that replaces path on success only if it differs.
+
+    See output_files.atomic_write.
+    """
+    return atomic_write(path)
+
+# A run of tags, with any whitespace between them.
+_TAG_RUN_RE = re.compile(r'(<[^>]*>(?:\s*<[^>]*>)*)')
+
+def compact_cards(cards: list[str]) -> tuple[list[str], list[list[int]]]:
+    """Split cards into shared parts and, per card, a row of part indexes.
+
+    Cards are cut into runs of tags and the text between them. Each distinct
+    run or text is stored once in parts, so template markup and repeated
+    values such as commander names are not repeated per card. Joining a
+    row's parts gives the card back, minified.
+    """
+    index = {}
+    rows = []
+    for card in cards:
+        # split() with a group alternates text and tag runs, starting with text.
+        tokens = _TAG_RUN_RE.split(card)
+        tokens[0] = tokens[0].lstrip()
+        tokens[-1] = tokens[-1].rstrip()
+        rows.append([index.setdefault(token, len(index)) for token in tokens if token])
+    parts = [minify_html(part) if part.startswith('<') else part for part in index]
+    return parts, rows
+
+def generate_virtual_html(data: dict, type_filter: list[str] = None, jobs: int = 1,
+                          cache: FragmentCache = None, metrics: RenderMetrics = None,
+                          assets: tuple[str, str] = None) -> str:
+    """Generate a page that renders cards lazily from an embedded JSON data island.
+
+    Cards come from the same templates as the static page, with sprite roses.
+    The island holds them in the compact_cards() form: each distinct piece
+    of markup or text once, in a shared parts list, and one row per event of
+    [type, part indexes...]. The page script joins a row back into its card
+    when it scrolls into view.
+    """
+    stylesheet, script_src = assets or (None, None)
+    events = [event for event in data['events'] if not type_filter or event['type'] in type_filter]
+    with stage(metrics, 'render'):
+        cards = render_cards(events, data['factions'], True, jobs, cache, metrics)
+    with stage(metrics, 'assemble'):
+        parts, rows = compact_cards(cards)
+        island = {'parts': parts, 'events': [[event['type'], *row] for event, row in zip(events, rows)]}
+        island = json.dumps(island, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+        return ''.join([
+            generate_page_header(data['conflict'], data['period'], data['factions'], type_filter,
+                                 True, stylesheet=stylesheet),
+            generate_page_footer(data['conflict'], f"""
+        <script type="application/json" id="events-data">{island}</script>""", VIRTUAL_SCRIPT,
+                                 script_src),
+        ])
+
+def paginate(events: list[dict], per: str) -> list[tuple[str, list[dict]]]:
+    """Split events into (label, events) pages, by year or per N events.
+
+    per is 'year' or a number of events per page.
+    """
+    if per == 'year':
+        years = {}
+        for event in events:
+            years.setdefault(event['date'][:4], []).append(event)
+        return list(years.items())
+    size = int(per)
+    return [(str(n + 1), events[start:start + size])
+            for n, start in enumerate(range(0, len(events), size))]
+
+def page_filename(index: int, label: str, per: str) -> str:
+    """Return the file name of a page; the first page is index.html."""
+    if index == 0:
+        return 'index.html'
+    return f'{label}.html' if per == 'year' else f'page-{label}.html'
+
+def _pager(pages: list[tuple[str, list[dict]]], current: int, per: str, window: int = 5) -> str:
+    """Return navigation with prev/next, first/last and nearby pages."""
+    def link(i, text=None, rel=''):
+        attrs = ' aria-current="page"' if i == current and not rel else rel
+        return f'<a href="{page_filename(i, pages[i][0], per)}"{attrs}>{text or pages[i][0]}</a>'
+
+    last = len(pages) - 1
+    shown = sorted({0, last, *range(max(0, current - window), min(last, current + window) + 1)})
+    items = []
+    if current > 0:
+        items.append(link(current - 1, '&larr;', ' rel="prev"'))
+    for k, i in enumerate(shown):
+        if k and i != shown[k - 1] + 1:
+            items.append('<span>&hellip;</span>')
+        items.append(link(i))
+    if current < last:
+        items.append(link(current + 1, '&rarr;', ' rel="next"'))
+    return f"""
+        <nav class="pager">{''.join(items)}</nav>"""
+
+def _write_html(path: Path, html: str, assets: tuple[str, str] = None,
+                metrics: RenderMetrics = None):
+    """Write one page of a multi-page build, minified with precompressed copies if assets."""
+    with stage(metrics, 'write'):
+        if assets:
+            size = write_page(path, html)
+        else:
+            with open_output(path) as out:
+                out.write(html)
+            # Encoding again only to count the bytes, so skip it without --metrics.
+            size = len(html.encode('utf-8')) if metrics is not None else 0
+    if metrics is not None:
+        metrics.output_bytes += size
+
+def write_pages(data: dict, out_dir: Path, per: str, type_filter: list[str] = None,
+                sprites: bool = False, jobs: int = 1, cache: FragmentCache = None,
+                metrics: RenderMetrics = None, assets: tuple[str, str] = None) -> list[Path]:
+    """Write the timeline as linked HTML pages, by year or per N events.
+
+    Pages whose contents are unchanged are left untouched. With assets the
+    pages link the shared stylesheet and script and are written minified
+    with precompressed copies. Returns the paths of all pages.
+    """
+    stylesheet, script_src = assets or (None, None)
+    events = [event for event in data['events'] if not type_filter or event['type'] in type_filter]
+    pages = paginate(events, per) or [('1', [])]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    header = generate_page_header(data['conflict'], data['period'], data['factions'], type_filter,
+                                  sprites, PAGER_STYLE, stylesheet)
+    with stage(metrics, 'render'):
+        cards = iter(render_cards(events, data['factions'], sprites, jobs, cache, metrics))
+    paths = []
+    for i, (label, page_events) in enumerate(pages):
+        path = out_dir / page_filename(i, label, per)
+        html = ''.join([header, *(next(cards) for _ in page_events),
+                        generate_page_footer(data['conflict'], _pager(pages, i, per),
+                                             script_src=script_src)])
+        _write_html(path, html, assets, metrics)
+        paths.append(path)
+    return paths
+
+# View file filters, by the option name they share, and the Query argument each sets.
+VIEW_FILTERS = {'type': 'types', 'from': 'date_from', 'to': 'date_to', 'faction': 'allegiances',
+                'commander': 'commanders', 'person': 'people'}
+
+def load_views(path) -> list[tuple[str, list[str], Query]]:
+    """Read a --views file into (file name, types, query) triples.
+
+    The file maps output file names to filter objects. from and to take a
+    date; the other filters take a string or a list of alternatives. Raises
+    ValueError describing the first problem.
+    """
+    with open(path, encoding='utf-8') as f:
+        spec = json.load(f)
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError('expected a non-empty object from output file names to filters')
+    views = []
+    for name, filters in spec.items():
+        if not name or Path(name).name != name:
+            raise ValueError(f'{name!r}: expected a file name, not a path')
+        if not isinstance(filters, dict):
+            raise ValueError(f'{name!r}: expected an object of filters')
+        options = {}
+        for key, value in filters.items():
+            if key not in VIEW_FILTERS:
+                raise ValueError(f"{name!r}: unknown filter {key!r} "
+                                 f"(choose from {', '.join(map(repr, VIEW_FILTERS))})")
+            if key in ('from', 'to'):
+                if not (isinstance(value, str) and is_date_prefix(value)):
+                    raise ValueError(f'{name!r}: {key!r} must be a date as YYYY, YYYY-MM or '
+                                     f'YYYY-MM-DD, got {value!r}')
+            else:
+                if isinstance(value, str):
+                    value = [value]
+                if not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+                    raise ValueError(f'{name!r}: {key!r} must be a string or a list of strings')
+            options[VIEW_FILTERS[key]] = value
+        for event_type in options.get('types', ()):
+            if event_type not in EVENT_TEMPLATES:
+                raise ValueError(f'{name!r}: unknown event type {event_type!r}')
+        views.append((name, options.get('types'), Query(**options)))
+    return views
+
+def write_views(data: dict, views: list[tuple[str, list[str], Query]], out_dir: Path,
+                sprites: bool = False, virtual: bool = False, jobs: int = 1,
+                cache: FragmentCache = None, metrics: RenderMetrics = None,
+                assets: tuple[str, str] = None) -> list[Path]:
+    """Write one page per view into out_dir, all queried from one EventIndex.
+
+    Pages whose contents are unchanged are left untouched. Returns their paths.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with stage(metrics, 'query'):
+        index = EventIndex(data['events'])
+    paths = []
+    for name, types, query in views:
+        with stage(metrics, 'query'):
+            view = dict(data, events=index.query(query))
+        if virtual:
+            html = generate_virtual_html(view, types, jobs, cache, metrics, assets)
+        else:
+            html = generate_html(view, types, sprites, jobs, cache, metrics, assets)
+        path = out_dir / name
+        _write_html(path, html, assets, metrics)
+        paths.append(path)
+    return paths
+
+def write_deploy_assets(out_dir: Path, virtual: bool = False) -> tuple[str, str]:
+    """Write the shared minified stylesheet and script; return their URLs."""
+    stylesheet = write_asset(out_dir, 'timeline', '.css', minify_css(PAGE_STYLE + PAGER_STYLE))
+    if virtual:
+        script_src = write_asset(out_dir, 'timeline-virtual', '.js', minify_js(VIRTUAL_SCRIPT))
+    else:
+        script_src = write_asset(out_dir, 'timeline', '.js', minify_js(FILTER_SCRIPT))
+    return stylesheet, script_src
 
 def main():
     parser = argparse.ArgumentParser(description='Render Wars of the Roses events to HTML timeline')
-    parser.add_argument('--type', '-t', action='append', dest='types',
-                        choices=['battle', 'death', 'accession', 'treaty'],
-                        help='Filter by event type (can be specified multiple times)')
+    parser.add_argument('--type', '-t', action='append', dest='types', metavar='TYPE',
+                        help='Filter by event type: %s, or one added by a plugin '
+                             '(can be specified multiple times)' % ', '.join(EVENT_TEMPLATES))
+    parser.add_argument('--plugin', action='append', dest='plugins', default=[], metavar='MODULE',
+                        help='Import MODULE to register extra event types (can be specified multiple times)')
+    parser.add_argument('--from', dest='date_from', metavar='DATE',
+                        help='Only events on or after DATE (YYYY, YYYY-MM or YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', metavar='DATE',
+                        help='Only events on or before DATE (YYYY, YYYY-MM or YYYY-MM-DD)')
+    parser.add_argument('--faction', '-f', action='append', dest='factions', metavar='FACTION',
+                        help='Only battles won by, or accessions of, FACTION (can be specified multiple times)')
+    parser.add_argument('--commander', '-c', action='append', dest='commanders', metavar='NAME',
+                        help='Only battles with commander NAME (can be specified multiple times)')
+    parser.add_argument('--person', '-p', action='append', dest='people', metavar='NAME',
+                        help='Only events about person, monarch or party NAME (can be specified multiple times)')
+    parser.add_argument('--sprites', action='store_true',
+                        help='Define each rose once as an SVG symbol and reference it with <use>')
+    parser.add_argument('--stream', action='store_true',
+                        help='Parse and render one event at a time in bounded memory')
+    parser.add_argument('--virtual', action='store_true',
+                        help='Embed events as a JSON data island and render cards lazily near the viewport')
+    parser.add_argument('--paginate', metavar='year|N',
+                        help='Write one page per year, or per N events, into --output-dir')
+    parser.add_argument('--views', type=Path, metavar='FILE',
+                        help='Write the filtered pages described by FILE into --output-dir')
+    parser.add_argument('--output-dir', type=Path, metavar='DIR',
+                        help='Directory for --paginate or --views pages')
+    parser.add_argument('--deploy', action='store_true',
+                        help='Link shared content-hashed CSS/JS under assets/, minify the HTML and '
+                             'write .gz/.br copies (needs --output, --paginate or --views)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Load events as interned __slots__ records instead of dicts')
+    parser.add_argument('--pack-dates', action='store_true',
+                        help='With --compact, hold dates as ordinals in an array (implies --compact)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='Render event cards in N worker processes')
+    parser.add_argument('--output', '-o', metavar='FILE',
+                        help='Write to FILE instead of stdout, leaving it untouched if unchanged')
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=False,
+                        help='Reuse rendered cards from the on-disk fragment cache (default: off)')
+    parser.add_argument('--cache-dir', type=Path, default=None, metavar='DIR',
+                        help='Fragment cache directory (default: %s)' % default_cache_dir())
+    parser.add_argument('--cache-size', type=int, default=None, metavar='MB',
+                        help='Evict cached fragments beyond this size (default: %d)'
+                             % (DEFAULT_MAX_BYTES // (1024 * 1024)))
+    parser.add_argument('--validate', nargs='?', const='all', choices=['all', 'first'],
+                        help='Check the input against the schema before rendering, reporting '
+                             'all errors (default) or stopping at the first')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Write stage timings, per-type render times, slowest events, '
+                             'peak memory and output size to FILE as JSON')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Run under cProfile and dump the stats to FILE')
     args = parser.parse_args()
-    data = json.load(sys.stdin)
-    html_content = generate_html(data, args.types)
-    sys.stdout.write(html_content)
+    try:
+        load_plugins(args.plugins)
+    except ImportError as e:
+        parser.error(f'cannot load plugin: {e}')
+    for event_type in args.types or ():
+        if event_type not in EVENT_TEMPLATES:
+            parser.error(f"argument --type/-t: invalid choice: '{event_type}' "
+                         f"(choose from {', '.join(map(repr, EVENT_TEMPLATES))})")
+    for option, value in (('--from', args.date_from), ('--to', args.date_to)):
+        if value is not None and not is_date_prefix(value):
+            parser.error(f'{option} must be a date as YYYY, YYYY-MM or YYYY-MM-DD, got {value!r}')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.stream and args.jobs > 1:
+        parser.error('--jobs cannot be combined with --stream')
+    if args.paginate is not None:
+        if args.paginate != 'year' and not (args.paginate.isdigit() and int(args.paginate) > 0):
+            parser.error("--paginate must be 'year' or a positive number of events")
+        if args.output_dir is None:
+            parser.error('--paginate requires --output-dir')
+        if args.output or args.virtual or args.stream or args.views:
+            parser.error('--paginate cannot be combined with --output, --virtual, --stream or --views')
+    elif args.views is not None:
+        if args.output_dir is None:
+            parser.error('--views requires --output-dir')
+        if args.output or args.stream:
+            parser.error('--views cannot be combined with --output or --stream')
+        if any((args.types, args.date_from, args.date_to, args.factions, args.commanders,
+                args.people)):
+            parser.error('--views cannot be combined with --type, --from, --to, --faction, '
+                         '--commander or --person; put the filters in the views file')
+    elif args.output_dir is not None:
+        parser.error('--output-dir is only used with --paginate or --views')
+    if args.virtual and args.stream:
+        parser.error('--virtual cannot be combined with --stream')
+    if args.deploy and (args.stream or not (args.output or args.paginate or args.views)):
+        parser.error('--deploy needs --output, --paginate or --views, and cannot be combined '
+                     'with --stream')
+    if not args.cache and (args.cache_dir or args.cache_size is not None):
+        parser.error('--cache-dir and --cache-size need --cache')
+    if args.stream and (args.compact or args.pack_dates):
+        parser.error('--compact cannot be combined with --stream')
+    if args.stream and args.cache:
+        # The cache holds a whole pack in memory, which --stream is meant to avoid.
+        parser.error('--cache cannot be combined with --stream')
+    views = None
+    if args.views is not None:
+        try:
+            views = load_views(args.views)
+        except OSError as e:
+            parser.error(f'cannot read --views file: {e}')
+        except ValueError as e:
+            parser.error(f'{args.views}: {e}')
+    query = Query(types=args.types, date_from=args.date_from, date_to=args.date_to,
+                  allegiances=args.factions, commanders=args.commanders, people=args.people)
+    validator = load_validator() if args.validate else None
+    fail_fast = args.validate == 'first'
+    cache = None
+    if args.cache:
+        max_bytes = DEFAULT_MAX_BYTES if args.cache_size is None else args.cache_size * 1024 * 1024
+        cache = FragmentCache(args.cache_dir or default_cache_dir(), renderer_version(), max_bytes)
+    metrics = RenderMetrics() if args.metrics else None
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        render(args, query, validator, fail_fast, cache, metrics, views)
+    except ValidationError as e:
+        for path, message in e.errors:
+            print(f'{path or "/"}: {message}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+    if cache is not None:
+        with stage(metrics, 'write'):
+            cache.flush()
+            cache.evict()
+    if metrics is not None:
+        if cache is not None:
+            metrics.extra['cache'] = {'hits': cache.hits, 'misses': cache.misses}
+        metrics.write(args.metrics)
+
+def render(args, query: Query, validator: Validator, fail_fast: bool,
+           cache: FragmentCache, metrics: RenderMetrics, views: list = None):
+    """Read stdin and write the output selected by the command line arguments."""
+    output = open_output(args.output) if args.output else nullcontext(sys.stdout)
+    if args.stream:
+        with output as out:
+            if metrics is not None:
+                out = MeteredWriter(out, metrics)
+            stream_html(sys.stdin, out, args.types, args.sprites, query, validator, fail_fast,
+                        metrics)
+        return
+    if args.compact or args.pack_dates:
+        with stage(metrics, 'parse'):
+            data = load_compact(sys.stdin, args.pack_dates, validator, fail_fast)
+    else:
+        with stage(metrics, 'parse'):
+            data = json.load(sys.stdin)
+        if validator is not None:
+            with stage(metrics, 'validate'):
+                validator.validate(data, fail_fast)
+    if query:
+        with stage(metrics, 'query'):
+            data = dict(data, events=query.filter(data['events']))
+    assets = None
+    if args.deploy:
+        out_dir = args.output_dir if args.paginate or views else Path(args.output).parent
+        out_dir.mkdir(parents=True, exist_ok=True)
+        assets = write_deploy_assets(out_dir, args.virtual)
+    if args.paginate:
+        write_pages(data, args.output_dir, args.paginate, args.types, args.sprites,
+                    args.jobs, cache, metrics, assets)
+        return
+    if views:
+        write_views(data, views, args.output_dir, args.sprites, args.virtual, args.jobs, cache,
+                    metrics, assets)
+        return
+    if args.virtual:
+        html_content = generate_virtual_html(data, args.types, args.jobs, cache, metrics, assets)
+    else:
+        html_content = generate_html(data, args.types, args.sprites, args.jobs, cache, metrics,
+                                     assets)
+    if args.deploy:
+        with stage(metrics, 'write'):
+            size = write_page(Path(args.output), html_content)
+        if metrics is not None:
+            metrics.output_bytes += size
+        return
+    with output as out:
+        if metrics is not None:
+            out = MeteredWriter(out, metrics)
+        out.write(html_content)
 
 if __name__ == '__main__':
+    # Plugins import render_events; make that the running module, not a second copy.
+    sys.modules.setdefault('render_events', sys.modules[__name__])
     main()
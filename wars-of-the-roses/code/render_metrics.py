@@ -0,0 +1,126 @@
+"""
+Stage timings and per-event statistics for render_events.py --metrics.
+
+RenderMetrics accumulates wall time per stage (parse, validate, query,
+render, assemble, write), per-event-type counts and render time, the slowest
+individual events, the peak RSS after each stage and the output size, and
+serialises them as JSON for build dashboards.
+
+The renderer only creates a RenderMetrics when --metrics is given; every
+hook is guarded by a None check, so a build without it does no extra work.
+"""
+
+import heapq
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+def peak_rss_bytes():
+    """Return this process's peak resident set size in bytes, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class RenderMetrics:
+    """Collects metrics for one render."""
+
+    def __init__(self, slowest: int = 10):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.event_types = {}
+        self.slowest_limit = slowest
+        self._slowest = []
+        self._seq = 0
+        self.output_bytes = 0
+        self.extra = {}
+
+    def add(self, name: str, seconds: float):
+        """Add seconds to a stage; stages may be entered many times."""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'seconds': 0.0, 'calls': 0}
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            self.stages[name]['peak_rss_bytes'] = peak_rss_bytes()
+
+    def record_event(self, event: dict, seconds: float):
+        """Record the render time of one event."""
+        stats = self.event_types.get(event['type'])
+        if stats is None:
+            stats = self.event_types[event['type']] = {'count': 0, 'seconds': 0.0}
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        self._seq += 1
+        entry = (seconds, self._seq, event)
+        if len(self._slowest) < self.slowest_limit:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def report(self) -> dict:
+        slowest = sorted(self._slowest, reverse=True)
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'stages': self.stages,
+            'event_types': self.event_types,
+            'events_rendered': sum(stats['count'] for stats in self.event_types.values()),
+            'slowest_events': [
+                {'seconds': seconds, 'type': event['type'], 'date': event['date'], 'name': event['name']}
+                for seconds, _, event in slowest
+            ],
+            'peak_rss_bytes': peak_rss_bytes(),
+            'output_bytes': self.output_bytes,
+            **self.extra,
+        }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+def timed_iter(iterable, metrics: RenderMetrics, name: str):
+    """Yield from iterable, adding the time spent producing each item to a stage."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            metrics.add(name, time.perf_counter() - start)
+            return
+        metrics.add(name, time.perf_counter() - start)
+        yield item
+
+def stage(metrics, name: str):
+    """Return metrics.stage(name), or a no-op context when metrics is None."""
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+class MeteredWriter:
+    """Wrap a text stream, timing writes and counting UTF-8 output bytes."""
+
+    def __init__(self, out, metrics: RenderMetrics):
+        self.out = out
+        self.metrics = metrics
+
+    def write(self, text: str) -> int:
+        start = time.perf_counter()
+        written = self.out.write(text)
+        self.metrics.add('write', time.perf_counter() - start)
+        self.metrics.output_bytes += len(text.encode('utf-8'))
+        return written
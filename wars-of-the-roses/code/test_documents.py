@@ -0,0 +1,163 @@
+"""
+Tests for reading and validating timeline documents: the incremental
+render_events.iter_document parser, and the schema validator's error reports.
+
+Run from this directory with python -m unittest (or pytest).
+"""
+
+import io
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+import render_events
+from validate_events import ValidationError, load_validator
+
+HERE = Path(__file__).resolve().parent
+SAMPLE = HERE.parent / 'wars_of_the_roses.json'
+
+# Numbers of every JSON form, so that some chunk size cuts each one after its
+# sign, digits, '.', 'e' or exponent sign.
+NUMBERS_DOC = '''{"conflict": "T\\u00e9st \\"quoted\\"", "period": "1455-1487",
+ "factions": {"york": "York"}, "scale": 1460.25,
+ "events": [
+  {"type": "battle", "date": "1460-07-10", "n": -3e-7, "m": 0.5E+10, "k": 12345678901234567890},
+  {"type": "death", "date": "1461", "values": [1, -2.0, 3e2, true, false, null, {"x": 1460.25}]},
+  {"type": "event", "n": 7}
+ ],
+ "tail": 42.125e-3}'''
+
+def read_document(text: str, chunk_size: int) -> dict:
+    """Reassemble a document from iter_document's items."""
+    data = {}
+    for kind, key, item in render_events.iter_document(io.StringIO(text), chunk_size):
+        if kind == 'event':
+            events = data.setdefault('events', [])
+            assert key == len(events)
+            events.append(item)
+        else:
+            data[key] = item
+    return data
+
+class IterDocumentTests(unittest.TestCase):
+
+    def test_every_chunk_size_matches_json_load(self):
+        expected = json.loads(NUMBERS_DOC)
+        for chunk_size in range(1, len(NUMBERS_DOC) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(read_document(NUMBERS_DOC, chunk_size), expected)
+
+    def test_number_cut_after_its_point(self):
+        # A chunk of 5 ends {"a": 1460. mid-number; it must not read as 1460.
+        self.assertEqual(read_document('{"a": 1460.25}', 5), {'a': 1460.25})
+        self.assertEqual(read_document('{"a": [1e5]}', 8), {'a': [1e5]})
+
+    def test_sample_matches_json_load(self):
+        text = SAMPLE.read_text(encoding='utf-8')
+        expected = json.loads(text)
+        for chunk_size in (1, 2, 3, 7, 64, 1000, 1 << 16):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(read_document(text, chunk_size), expected)
+
+    def test_empty_document_and_events(self):
+        self.assertEqual(read_document('{}', 1), {})
+        self.assertEqual(read_document('{"events": [], "period": "1455-1487"}', 3),
+                         {'period': '1455-1487'})
+
+    def test_malformed_input_raises(self):
+        for text in ('{"a": 1', '{"a": 1 "b": 2}', '{"events": [1 2]}', '[1]', '{"a": 1460.}'):
+            for chunk_size in (1, 4, 1 << 16):
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        read_document(text, chunk_size)
+
+def timeline(*events, **members) -> dict:
+    data = {'conflict': 'Test', 'period': '1455-1487', 'factions': {'york': 'York'},
+            'events': list(events)}
+    data.update(members)
+    return data
+
+def event(**fields) -> dict:
+    return dict({'type': 'death', 'name': 'Someone', 'date': '1460-01-01', 'person': 'Someone'},
+                **fields)
+
+class ValidatorTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.validator = load_validator()
+
+    def assertErrors(self, data, expected):
+        self.assertEqual(self.validator.errors(data), expected)
+
+    def test_sample_is_valid(self):
+        self.assertEqual(self.validator.errors(json.loads(SAMPLE.read_text(encoding='utf-8'))), [])
+
+    def test_unhashable_discriminator(self):
+        for value in (['battle'], {}, [['battle']]):
+            with self.subTest(value=value):
+                errors = self.validator.errors(timeline(event(type=value)))
+                self.assertEqual(len(errors), 1)
+                path, message = errors[0]
+                self.assertEqual(path, '/events/0/type')
+                self.assertTrue(message.startswith(f'{value!r} is not one of '), message)
+
+    def test_unknown_and_missing_type(self):
+        errors = self.validator.errors(timeline(event(type='siege'), {'name': 'x', 'date': '1460-01-01'}))
+        self.assertEqual([path for path, _ in errors], ['/events/0/type', '/events/1'])
+        self.assertIn("'siege' is not one of", errors[0][1])
+        self.assertEqual(errors[1][1], "missing required property 'type'")
+
+    def test_event_not_an_object(self):
+        self.assertErrors(timeline('battle'), [('/events/0', 'expected object')])
+
+    def test_field_errors(self):
+        battle = {'type': 'battle', 'name': 'x', 'date': '1460-02-30', 'commanders': [],
+                  'victor': 'york'}
+        self.assertErrors(timeline(battle), [
+            ('/events/0/date', "'1460-02-30' is not a valid date"),
+            ('/events/0/commanders', 'expected at least 1 items, got 0'),
+        ])
+
+    def test_members(self):
+        data = timeline(period='1455', factions={'york': 1})
+        del data['conflict']
+        self.assertErrors(data, [
+            ('', "missing required property 'conflict'"),
+            ('/period', "'1455' does not match '^\\\\d{4}-\\\\d{4}$'"),
+            ('/factions/york', 'expected string, got int'),
+        ])
+
+    def test_fail_fast_stops_at_first_error(self):
+        data = timeline(event(type=[]), event(date='1460'))
+        self.assertEqual(len(self.validator.errors(data)), 2)
+        self.assertEqual(self.validator.errors(data, fail_fast=True),
+                         [('/events/0/type', "[] is not one of 'battle', 'death', 'accession', "
+                                             "'treaty', 'event'")])
+
+    def test_stream_reports_the_same_errors(self):
+        data = timeline(event(type={}), event(), event(date='1460'))
+        with self.assertRaises(ValidationError) as caught:
+            render_events.stream_html(io.StringIO(json.dumps(data)), io.StringIO(),
+                                      validator=self.validator)
+        self.assertEqual(caught.exception.errors, self.validator.errors(data))
+
+    def test_cli_reports_errors_without_a_traceback(self):
+        data = json.dumps(timeline(event(type=['battle'])))
+        for args in ([], ['--stream'], ['--compact']):
+            with self.subTest(args=args):
+                result = subprocess.run(
+                    [sys.executable, str(HERE / 'render_events.py'), '--validate', *args],
+                    input=data, capture_output=True, text=True, encoding='utf-8')
+                self.assertEqual(result.returncode, 1)
+                if '--stream' not in args:
+                    # --stream has already written the header when it finds the error.
+                    self.assertEqual(result.stdout, '')
+                self.assertTrue(result.stderr.startswith("/events/0/type: ['battle'] is not one of "),
+                                result.stderr)
+                self.assertNotIn('Traceback', result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
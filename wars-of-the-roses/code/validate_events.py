@@ -0,0 +1,359 @@
+"""
+Validate timeline data against wars_of_the_roses_schema.json.
+
+The schema is compiled once into a tree of small checking closures, one per
+schema node, so validating an event costs a few dict lookups and isinstance
+calls rather than a walk over the schema. A oneOf with a discriminator is
+compiled to a dict from the discriminator value to the matching branch, so
+each event is only checked against its own type.
+
+Only the keywords the bundled schema uses are supported: type, const, enum,
+required, properties, additionalProperties, items, minItems, pattern,
+format "date", $ref (local), allOf and oneOf (with optional discriminator).
+
+Usage:
+    python validate_events.py [--first] < wars_of_the_roses.json
+"""
+
+import argparse
+import datetime
+import json
+import re
+import sys
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / 'wars_of_the_roses_schema.json'
+
+JSON_TYPES = {
+    'object': lambda v: isinstance(v, dict),
+    'array': lambda v: isinstance(v, list),
+    'string': lambda v: isinstance(v, str),
+    'integer': lambda v: isinstance(v, int) and not isinstance(v, bool),
+    'number': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    'boolean': lambda v: isinstance(v, bool),
+    'null': lambda v: v is None,
+}
+
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def _is_date(value: str) -> bool:
+    if not DATE_RE.fullmatch(value):
+        return False
+    try:
+        datetime.date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+FORMATS = {'date': _is_date}
+
+class ValidationError(ValueError):
+    """Raised when data does not match the schema; errors lists every problem found."""
+
+    def __init__(self, errors: list[tuple[str, str]]):
+        self.errors = errors
+        super().__init__('\n'.join(f'{path or "/"}: {message}' for path, message in errors))
+
+def format_path(path) -> str:
+    """Turn a (parent, key) chain into a JSON pointer string.
+
+    Checkers pass paths as nested tuples so that no string is built unless an
+    error is actually reported.
+    """
+    parts = []
+    while isinstance(path, tuple):
+        path, key = path
+        parts.append(str(key))
+    parts.append(path)
+    return '/'.join(reversed(parts))
+
+class _FirstError(Exception):
+    pass
+
+class _Errors(list):
+    """Error collector; in fail-fast mode the first error stops validation."""
+
+    def __init__(self, fail_fast: bool = False):
+        super().__init__()
+        self.fail_fast = fail_fast
+
+    def add(self, path, message: str):
+        self.append((format_path(path), message))
+        if self.fail_fast:
+            raise _FirstError
+
+class _Probe:
+    """Collector for trying a oneOf branch: stops at the first error."""
+
+    def add(self, path, message: str):
+        raise _FirstError
+
+def _accepts(check, value, path) -> bool:
+    probe = _Probe()
+    try:
+        check(value, path, probe)
+    except _FirstError:
+        return False
+    return True
+
+class SchemaCompiler:
+    """Compile schema nodes to check(value, path, errors) closures."""
+
+    def __init__(self, schema: dict):
+        self.schema = schema
+        self.compiled = {}
+
+    def resolve(self, pointer: str) -> dict:
+        """Return the schema node at a JSON pointer such as '#/$defs/event'."""
+        node = self.schema
+        for part in pointer.lstrip('#').strip('/').split('/'):
+            if part:
+                node = node[part.replace('~1', '/').replace('~0', '~')]
+        return node
+
+    def ref(self, pointer: str):
+        """Return the compiled checker for pointer, compiling it on first use."""
+        if pointer not in self.compiled:
+            # Placeholder so recursive references resolve to the finished checker.
+            self.compiled[pointer] = None
+            check = self.compile(self.resolve(pointer))
+            self.compiled[pointer] = check
+        check = self.compiled[pointer]
+        if check is None:
+            return lambda value, path, errors: self.compiled[pointer](value, path, errors)
+        return check
+
+    def _const_of(self, node: dict, prop: str):
+        """Find the const value a schema node requires for prop, looking through $ref/allOf."""
+        if '$ref' in node:
+            return self._const_of(self.resolve(node['$ref']), prop)
+        const = node.get('properties', {}).get(prop, {}).get('const')
+        if const is not None:
+            return const
+        for part in node.get('allOf', ()):
+            const = self._const_of(part, prop)
+            if const is not None:
+                return const
+        return None
+
+    def compile(self, node: dict):
+        checks = []
+        if '$ref' in node:
+            checks.append(self.ref(node['$ref']))
+        if 'type' in node:
+            checks.append(self._type(node['type']))
+        if 'const' in node:
+            checks.append(self._const(node['const']))
+        if 'enum' in node:
+            checks.append(self._enum(node['enum']))
+        if 'pattern' in node:
+            checks.append(self._pattern(node['pattern']))
+        if node.get('format') in FORMATS:
+            checks.append(self._format(node['format']))
+        if any(key in node for key in ('required', 'properties', 'additionalProperties')):
+            checks.append(self._object(node))
+        if 'items' in node or 'minItems' in node:
+            checks.append(self._array(node))
+        for part in node.get('allOf', ()):
+            checks.append(self.compile(part))
+        if 'oneOf' in node:
+            checks.append(self._one_of(node))
+
+        if not checks:
+            return lambda value, path, errors: None
+        if len(checks) == 1:
+            return checks[0]
+        checks = tuple(checks)
+
+        def check_all(value, path, errors):
+            for check in checks:
+                check(value, path, errors)
+        return check_all
+
+    def _type(self, expected):
+        names = [expected] if isinstance(expected, str) else list(expected)
+        label = ' or '.join(names)
+        if names in (['string'], ['object'], ['array']):
+            cls = {'string': str, 'object': dict, 'array': list}[names[0]]
+
+            def check(value, path, errors):
+                if not isinstance(value, cls):
+                    errors.add(path, f'expected {label}, got {type(value).__name__}')
+            return check
+        tests = tuple(JSON_TYPES[name] for name in names)
+
+        def check(value, path, errors):
+            if not any(test(value) for test in tests):
+                errors.add(path, f'expected {label}, got {type(value).__name__}')
+        return check
+
+    def _const(self, expected):
+        def check(value, path, errors):
+            if value != expected:
+                errors.add(path, f'expected {expected!r}, got {value!r}')
+        return check
+
+    def _enum(self, options):
+        def check(value, path, errors):
+            if value not in options:
+                errors.add(path, f'{value!r} is not one of {options!r}')
+        return check
+
+    def _pattern(self, pattern):
+        search = re.compile(pattern).search
+
+        def check(value, path, errors):
+            if isinstance(value, str) and not search(value):
+                errors.add(path, f'{value!r} does not match {pattern!r}')
+        return check
+
+    def _format(self, name):
+        test = FORMATS[name]
+
+        def check(value, path, errors):
+            if isinstance(value, str) and not test(value):
+                errors.add(path, f'{value!r} is not a valid {name}')
+        return check
+
+    def _object(self, node):
+        required = tuple(node.get('required', ()))
+        properties = {key: self.compile(sub) for key, sub in node.get('properties', {}).items()}
+        additional = node.get('additionalProperties', True)
+        if isinstance(additional, dict):
+            additional = self.compile(additional)
+
+        properties = tuple(properties.items())
+        allowed = frozenset(key for key, _ in properties)
+
+        def check(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for key in required:
+                if key not in value:
+                    errors.add(path, f'missing required property {key!r}')
+            for key, sub in properties:
+                if key in value:
+                    sub(value[key], (path, key), errors)
+            if additional is True or value.keys() <= allowed:
+                return
+            for key in value.keys() - allowed:
+                if additional is False:
+                    errors.add(path, f'unexpected property {key!r}')
+                else:
+                    additional(value[key], (path, key), errors)
+        return check
+
+    def _array(self, node):
+        items = self.compile(node['items']) if 'items' in node else None
+        min_items = node.get('minItems', 0)
+
+        def check(value, path, errors):
+            if not isinstance(value, list):
+                return
+            if len(value) < min_items:
+                errors.add(path, f'expected at least {min_items} items, got {len(value)}')
+            if items is not None:
+                for i, item in enumerate(value):
+                    items(item, (path, i), errors)
+        return check
+
+    def _one_of(self, node):
+        branches = node['oneOf']
+        prop = node.get('discriminator', {}).get('propertyName')
+        if prop:
+            mapping = {}
+            for branch in branches:
+                const = self._const_of(branch, prop)
+                if const is None:
+                    raise ValueError(f'oneOf branch {branch!r} has no const {prop!r}')
+                mapping[const] = self.compile(branch)
+            known = ', '.join(map(repr, mapping))
+
+            def check(value, path, errors):
+                if not isinstance(value, dict):
+                    errors.add(path, 'expected object')
+                    return
+                if prop not in value:
+                    errors.add(path, f'missing required property {prop!r}')
+                    return
+                try:
+                    branch = mapping.get(value[prop])
+                except TypeError:
+                    # An unhashable value (list, object) cannot be a discriminator.
+                    branch = None
+                if branch is None:
+                    errors.add((path, prop), f'{value[prop]!r} is not one of {known}')
+                    return
+                branch(value, path, errors)
+            return check
+
+        compiled = tuple(self.compile(branch) for branch in branches)
+
+        def check(value, path, errors):
+            matched = sum(_accepts(branch, value, path) for branch in compiled)
+            if matched != 1:
+                errors.add(path, f'expected exactly one oneOf branch to match, {matched} did')
+        return check
+
+class Validator:
+    """A compiled schema.
+
+    validate() checks a whole document; validate_event() and
+    validate_member() check pieces of one, for the streaming renderer.
+    """
+
+    def __init__(self, schema: dict):
+        compiler = SchemaCompiler(schema)
+        self.check = compiler.compile(schema)
+        self.required = tuple(schema.get('required', ()))
+        properties = schema.get('properties', {})
+        self.members = {key: compiler.ref(f'#/properties/{key}') for key in properties}
+        events = properties.get('events', {})
+        self.check_event = compiler.compile(events.get('items', {}))
+
+    def _run(self, check, value, path, fail_fast: bool) -> list[tuple[str, str]]:
+        errors = _Errors(fail_fast)
+        try:
+            check(value, path, errors)
+        except _FirstError:
+            pass
+        return errors
+
+    def errors(self, data, fail_fast: bool = False) -> list[tuple[str, str]]:
+        """Return (path, message) for each problem in data, or only the first."""
+        return self._run(self.check, data, '', fail_fast)
+
+    def validate(self, data, fail_fast: bool = False):
+        """Raise ValidationError if data does not match the schema."""
+        errors = self.errors(data, fail_fast)
+        if errors:
+            raise ValidationError(errors)
+
+    def validate_event(self, event, index: int, fail_fast: bool = False) -> list[tuple[str, str]]:
+        """Return the problems with one item of the events array."""
+        return self._run(self.check_event, event, (('', 'events'), index), fail_fast)
+
+    def validate_member(self, key: str, value, fail_fast: bool = False) -> list[tuple[str, str]]:
+        """Return the problems with one top-level member other than events."""
+        check = self.members.get(key)
+        if check is None:
+            return []
+        return self._run(check, value, ('', key), fail_fast)
+
+def load_validator(path: Path = SCHEMA_PATH) -> Validator:
+    """Compile the schema at path."""
+    with open(path, encoding='utf-8') as f:
+        return Validator(json.load(f))
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate Wars of the Roses events against the schema')
+    parser.add_argument('--first', action='store_true', help='Stop at the first error')
+    parser.add_argument('--schema', type=Path, default=SCHEMA_PATH, help='Schema file')
+    args = parser.parse_args()
+    errors = load_validator(args.schema).errors(json.load(sys.stdin), args.first)
+    for path, message in errors:
+        print(f'{path or "/"}: {message}', file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+if __name__ == '__main__':
+    main()